@@ -1,15 +1,20 @@
 # spotify_cli.py
 import argparse
 import os
-import glob
-import json
 import sys
-from spotify_analyzer import SpotifyAnalyzer
+from itertools import islice
+import matplotlib.pyplot as plt
+from spotify_analyzer import CACHE_DIR, SpotifyAnalyzer
 
 def find_spotify_json_files(directory):
     """Find all Spotify JSON files in a directory"""
-    pattern = os.path.join(directory, "*History*.json")
-    files = glob.glob(pattern)
+    # Same as globbing "*History*.json", but filters the directory entries by name only
+    with os.scandir(directory) as entries:
+        files = [
+            entry.path for entry in entries
+            if "History" in entry.name and entry.name.endswith(".json")
+            and not entry.name.startswith(".") and entry.is_file()
+        ]
     
     if not files:
         print(f"No Spotify data files found in {directory}")
@@ -20,69 +25,70 @@ def find_spotify_json_files(directory):
 
 def print_basic_stats(stats):
     """Print basic listening statistics"""
-    print("\n=== SPOTIFY LISTENING STATISTICS ===")
-    print(f"Period: {stats['start_date']} to {stats['end_date']} ({stats['date_range_days']} days)")
-    print(f"Total tracks played: {stats['total_songs_played']:,}")
-    print(f"Unique tracks: {stats['unique_tracks']:,}")
-    print(f"Unique artists: {stats['unique_artists']:,}")
-    print(f"Total listening time: {stats['total_listening_hours']:.2f} hours")
-    print(f"Average daily listening: {stats['avg_daily_hours']:.2f} hours")
+    lines = [
+        "\n=== SPOTIFY LISTENING STATISTICS ===",
+        f"Period: {stats['start_date']} to {stats['end_date']} ({stats['date_range_days']} days)",
+        f"Total tracks played: {stats['total_songs_played']:,}",
+        f"Unique tracks: {stats['unique_tracks']:,}",
+        f"Unique artists: {stats['unique_artists']:,}",
+        f"Total listening time: {stats['total_listening_hours']:.2f} hours",
+        f"Average daily listening: {stats['avg_daily_hours']:.2f} hours",
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def print_top_artists(artists, limit=10):
     """Print top artists"""
-    print("\n=== TOP ARTISTS ===")
+    lines = ["\n=== TOP ARTISTS ===", "\nBy Play Count:"]
+    lines += [
+        f"{i}. {artist}: {count} plays"
+        for i, (artist, count) in enumerate(islice(artists["by_count"].items(), limit), 1)
+    ]
     
-    print("\nBy Play Count:")
-    for i, (artist, count) in enumerate(artists["by_count"].items(), 1):
-        if i > limit:
-            break
-        print(f"{i}. {artist}: {count} plays")
-    
-    print("\nBy Time Listened:")
-    for i, (artist, hours) in enumerate(artists["by_time"].items(), 1):
-        if i > limit:
-            break
-        print(f"{i}. {artist}: {hours:.2f} hours")
+    lines.append("\nBy Time Listened:")
+    lines += [
+        f"{i}. {artist}: {hours:.2f} hours"
+        for i, (artist, hours) in enumerate(islice(artists["by_time"].items(), limit), 1)
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def print_top_tracks(tracks, limit=10):
     """Print top tracks"""
-    print("\n=== TOP TRACKS ===")
-    
-    print("\nBy Play Count:")
-    for i, ((track, artist), count) in enumerate(tracks["by_count"].items(), 1):
-        if i > limit:
-            break
-        print(f"{i}. {track} - {artist}: {count} plays")
+    lines = ["\n=== TOP TRACKS ===", "\nBy Play Count:"]
+    lines += [
+        f"{i}. {track} - {artist}: {count} plays"
+        for i, ((track, artist), count) in enumerate(islice(tracks["by_count"].items(), limit), 1)
+    ]
     
-    print("\nBy Time Listened:")
-    for i, ((track, artist), hours) in enumerate(tracks["by_time"].items(), 1):
-        if i > limit:
-            break
-        print(f"{i}. {track} - {artist}: {hours:.2f} hours")
+    lines.append("\nBy Time Listened:")
+    lines += [
+        f"{i}. {track} - {artist}: {hours:.2f} hours"
+        for i, ((track, artist), hours) in enumerate(islice(tracks["by_time"].items(), limit), 1)
+    ]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def print_listening_patterns(patterns):
     """Print listening patterns"""
-    print("\n=== LISTENING PATTERNS ===")
-    
-    print("\nTop 5 Hours:")
+    lines = ["\n=== LISTENING PATTERNS ===", "\nTop 5 Hours:"]
     hourly = patterns["hourly"].sort_values(ascending=False).head(5)
-    for hour, minutes in hourly.items():
-        print(f"{hour}:00 - {minutes:.1f} minutes")
+    lines += [f"{hour}:00 - {minutes:.1f} minutes" for hour, minutes in hourly.items()]
     
-    print("\nDays of Week (most to least):")
+    lines.append("\nDays of Week (most to least):")
     daily = patterns["daily"].sort_values(ascending=False)
-    for day, minutes in daily.items():
-        print(f"{day}: {minutes:.1f} minutes")
+    lines += [f"{day}: {minutes:.1f} minutes" for day, minutes in daily.items()]
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def print_streaks(streaks):
     """Print listening streaks"""
-    print("\n=== LISTENING STREAKS ===")
-    print(f"Days with activity: {streaks['days_with_activity']} out of {streaks['total_days_range']} days")
-    print(f"Activity ratio: {streaks['activity_ratio']:.2%}")
-    print(f"Longest streak: {streaks['longest_streak']} consecutive days")
+    lines = [
+        "\n=== LISTENING STREAKS ===",
+        f"Days with activity: {streaks['days_with_activity']} out of {streaks['total_days_range']} days",
+        f"Activity ratio: {streaks['activity_ratio']:.2%}",
+        f"Longest streak: {streaks['longest_streak']} consecutive days",
+    ]
     
     if streaks['longest_streak_start'] and streaks['longest_streak'] > 1:
-        print(f"Longest streak period: {streaks['longest_streak_start']} to {streaks['longest_streak_end']}")
+        lines.append(f"Longest streak period: {streaks['longest_streak_start']} to {streaks['longest_streak_end']}")
+    sys.stdout.write("\n".join(lines) + "\n")
 
 def main():
     parser = argparse.ArgumentParser(description="Analyze your Spotify listening data")
@@ -91,6 +97,8 @@ def main():
     parser.add_argument("data_path", help="Path to Spotify data file or directory containing JSON files")
     parser.add_argument("-o", "--output", help="Directory to save visualizations", default="spotify_analysis")
     parser.add_argument("-n", "--limit", help="Number of top items to show", type=int, default=10)
+    parser.add_argument("--cache", action="store_true",
+                        help="Cache the cleaned data next to the data files so later runs skip parsing")
     
     # Actions
     parser.add_argument("--stats", action="store_true", help="Show basic statistics")
@@ -118,7 +126,11 @@ def main():
     
     # Initialize analyzer
     try:
-        analyzer = SpotifyAnalyzer(json_files)
+        cache_dir = None
+        if args.cache:
+            data_dir = args.data_path if os.path.isdir(args.data_path) else os.path.dirname(args.data_path)
+            cache_dir = os.path.join(data_dir, CACHE_DIR)
+        analyzer = SpotifyAnalyzer(json_files, cache_dir=cache_dir)
         
         # If no specific actions were chosen, show basic stats
         if not (args.stats or args.artists or args.tracks or args.patterns or
@@ -148,6 +160,8 @@ def main():
         
         if args.report:
             print(f"\nGenerating full report with visualizations...")
+            # The figures only go to files, so skip the interactive backend
+            plt.switch_backend('Agg')
             analyzer.generate_report(args.output)
             print(f"Report saved to {args.output} directory")
     
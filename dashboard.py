@@ -1,16 +1,51 @@
 # spotify_dashboard.py
 import streamlit as st
 import pandas as pd
+import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-import os
+import plotly.io as pio
 import glob
 import sys
+import hashlib
 from datetime import datetime
 
 # Import the SpotifyAnalyzer class
 from spotify_analyzer import SpotifyAnalyzer
 
+# Shared figure layouts, registered once instead of calling update_layout on every rerun
+pio.templates["spotify_ranking"] = go.layout.Template(layout={"yaxis": {"categoryorder": "total ascending"}})
+pio.templates["spotify_monthly"] = go.layout.Template(layout={"xaxis": {"tickangle": -45}})
+RANKING_TEMPLATE = "spotify_ranking"
+MONTHLY_TEMPLATE = "spotify_monthly"
+
+def themed(overlay):
+    """Stack a layout overlay on the template that is active when the chart is drawn"""
+    return f"{pio.templates.default}+{overlay}"
+
+# Zero padded month numbers for the "YYYY-MM" labels
+MONTH_STR = np.array([f"{month:02d}" for month in range(1, 13)], dtype=object)
+
+def load_analyzer(uploaded_files):
+    """Reuse the parsed analyzer across reruns as long as the uploads don't change"""
+    hasher = hashlib.blake2b(digest_size=16)
+    for uploaded_file in uploaded_files:
+        hasher.update(uploaded_file.getbuffer())
+    files_key = hasher.hexdigest()
+    
+    if st.session_state.get("analyzer_key") != files_key:
+        # Parse the uploads straight from memory, no need for temporary files
+        st.session_state["analyzer"] = SpotifyAnalyzer.from_buffers(
+            [uploaded_file.getbuffer() for uploaded_file in uploaded_files]
+        )
+        st.session_state["analyzer_key"] = files_key
+    
+    return st.session_state["analyzer"]
+
+def track_labels(track_index):
+    """Join the (track, artist) index levels into "Track - Artist" labels"""
+    return track_index.get_level_values(0) + " - " + track_index.get_level_values(1)
+
 def main():
     st.set_page_config(
         page_title="Spotify Listening Dashboard",
@@ -44,20 +79,10 @@ def main():
         """)
         return
     
-    # Save uploaded files temporarily
-    temp_dir = "temp_spotify_data"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    temp_paths = []
-    for uploaded_file in uploaded_files:
-        file_path = os.path.join(temp_dir, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        temp_paths.append(file_path)
-    
     # Initialize analyzer with uploaded files
     try:
-        analyzer = SpotifyAnalyzer(temp_paths)
+        # The analyzer memoizes its results, so reruns reuse them without another cache layer
+        analyzer = load_analyzer(uploaded_files)
         
         # Basic stats section
         st.header("📊 Listening Overview")
@@ -105,9 +130,9 @@ def main():
                     x="Play Count", 
                     y="Artist", 
                     orientation='h',
-                    title="By Play Count"
+                    title="By Play Count",
+                    template=themed(RANKING_TEMPLATE)
                 )
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
@@ -116,46 +141,40 @@ def main():
                     x="Hours", 
                     y="Artist", 
                     orientation='h',
-                    title="By Hours Listened"
+                    title="By Hours Listened",
+                    template=themed(RANKING_TEMPLATE)
                 )
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
                 st.plotly_chart(fig, use_container_width=True)
         
         with tab2:
             top_n = st.slider("Number of top tracks to display", 5, 20, 10, key="track_slider")
             top_tracks = analyzer.top_tracks(top_n)
             
-            # Convert to dataframes for Plotly
-            tracks_by_count = pd.DataFrame(top_tracks["by_count"]).reset_index()
-            tracks_by_count.columns = ["Track", "Artist", "Play Count"]
-            tracks_by_count["Label"] = tracks_by_count["Track"] + " - " + tracks_by_count["Artist"]
-            
-            tracks_by_time = pd.DataFrame(top_tracks["by_time"]).reset_index()
-            tracks_by_time.columns = ["Track", "Artist", "Hours"]
-            tracks_by_time["Label"] = tracks_by_time["Track"] + " - " + tracks_by_time["Artist"]
+            by_count = top_tracks["by_count"]
+            by_time = top_tracks["by_time"]
             
             col1, col2 = st.columns(2)
             
             with col1:
                 fig = px.bar(
-                    tracks_by_count, 
-                    x="Play Count", 
-                    y="Label", 
+                    x=by_count.to_numpy(), 
+                    y=track_labels(by_count.index), 
                     orientation='h',
-                    title="By Play Count"
+                    title="By Play Count",
+                    labels={"x": "Play Count", "y": "Track"},
+                    template=themed(RANKING_TEMPLATE)
                 )
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
                 st.plotly_chart(fig, use_container_width=True)
             
             with col2:
                 fig = px.bar(
-                    tracks_by_time, 
-                    x="Hours", 
-                    y="Label", 
+                    x=by_time.to_numpy(), 
+                    y=track_labels(by_time.index), 
                     orientation='h',
-                    title="By Hours Listened"
+                    title="By Hours Listened",
+                    labels={"x": "Hours", "y": "Track"},
+                    template=themed(RANKING_TEMPLATE)
                 )
-                fig.update_layout(yaxis={'categoryorder':'total ascending'})
                 st.plotly_chart(fig, use_container_width=True)
         
         # Listening Patterns
@@ -238,21 +257,20 @@ def main():
             # Heatmap
             heatmap_data = analyzer.listening_heatmap_data()
             
-            # Convert to format needed for Plotly
-            heatmap_df = heatmap_data.reset_index()
-            heatmap_df = pd.melt(heatmap_df, id_vars="index", var_name="hour", value_name="minutes")
-            heatmap_df.columns = ["day", "hour", "minutes"]
-            
-            fig = px.density_heatmap(
-                heatmap_df,
-                x="hour",
-                y="day",
-                z="minutes",
+            # The data is already a day × hour matrix, so hand it to Plotly as is
+            fig = go.Figure(go.Heatmap(
+                z=heatmap_data.to_numpy(),
+                x=heatmap_data.columns,
+                y=heatmap_data.index,
+                colorbar={"title": "Minutes"},
+                hovertemplate="%{y}, %{x}:00<br>%{z:.0f} minutes<extra></extra>"
+            ))
+            fig.update_layout(
                 title="Listening Activity Heatmap (Hour × Day)",
-                labels={"minutes": "Minutes", "hour": "Hour of Day", "day": "Day of Week"},
-                category_orders={
-                    "day": ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday"]
-                }
+                xaxis_title="Hour of Day",
+                yaxis_title="Day of Week",
+                # Keep the user's zoom when a rerun redraws the chart
+                uirevision="constant"
             )
             
             st.plotly_chart(fig, use_container_width=True)
@@ -289,12 +307,12 @@ def main():
         # Monthly unique artists
         monthly_unique_df = pd.DataFrame(diversity["monthly_unique"]).reset_index()
         monthly_unique_df.columns = ["Year", "Month", "Unique Artists"]
-        monthly_unique_df["YearMonth"] = monthly_unique_df["Year"].astype(str) + "-" + monthly_unique_df["Month"].astype(str).str.zfill(2)
+        monthly_unique_df["YearMonth"] = monthly_unique_df["Year"].astype(str) + "-" + MONTH_STR[monthly_unique_df["Month"].to_numpy() - 1]
         
         # Monthly discovery ratio
         discovery_df = pd.DataFrame(diversity["monthly_discovery_ratio"]).reset_index()
         discovery_df.columns = ["Year", "Month", "Discovery Ratio"]
-        discovery_df["YearMonth"] = discovery_df["Year"].astype(str) + "-" + discovery_df["Month"].astype(str).str.zfill(2)
+        discovery_df["YearMonth"] = discovery_df["Year"].astype(str) + "-" + MONTH_STR[discovery_df["Month"].to_numpy() - 1]
         
         col1, col2 = st.columns(2)
         
@@ -303,9 +321,9 @@ def main():
                 monthly_unique_df, 
                 x="YearMonth", 
                 y="Unique Artists",
-                title="Unique Artists per Month"
+                title="Unique Artists per Month",
+                template=themed(MONTHLY_TEMPLATE)
             )
-            fig.update_layout(xaxis_tickangle=-45)
             st.plotly_chart(fig, use_container_width=True)
         
         with col2:
@@ -314,19 +332,12 @@ def main():
                 x="YearMonth", 
                 y="Discovery Ratio",
                 title="New Artist Discovery Ratio",
-                range_y=[0, 1]
+                range_y=[0, 1],
+                template=themed(MONTHLY_TEMPLATE)
             )
-            fig.update_layout(xaxis_tickangle=-45)
             st.plotly_chart(fig, use_container_width=True)
         
         st.write("The discovery ratio shows the proportion of new artists you listened to each month.")
-        
-        # Clean up temporary files
-        for file_path in temp_paths:
-            try:
-                os.remove(file_path)
-            except:
-                pass
             
     except Exception as e:
         st.error(f"Error analyzing data: {str(e)}")
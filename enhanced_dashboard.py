@@ -9,9 +9,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 import os
+import hashlib
+import shelve
+import threading
 import numpy as np
 from datetime import datetime
-import json
 
 # Import the enhanced SpotifyAnalyzer
 from spotify_analyzer import SpotifyAnalyzer
@@ -20,6 +22,282 @@ from spotify_features import enhance_spotify_analyzer
 # Enhance the SpotifyAnalyzer class with new features
 enhance_spotify_analyzer()
 
+# Static page content and chart colors, built once at import instead of on every rerun
+INSTRUCTIONS_MD = """
+### How to get your Spotify data:
+1. Go to your Spotify account page: [Privacy Settings](https://www.spotify.com/account/privacy/)
+2. Click on "Request your data"
+3. You'll receive an email with a download link within a few days
+4. Extract the ZIP file and look for files named like "StreamingHistory0.json"
+5. Upload those files here!
+
+### New Enhanced Features:
+- 🎸 **Genre Analysis**: Discover your most listened genres and genre diversity
+- 🎛️ **Audio Features Analysis**: Explore the acoustic characteristics of your music
+- ⏱️ **Listening Session Analysis**: Understand your listening behavior patterns
+- 🔮 **Context Prediction**: Identify when and why you listen to music
+
+Note: Genre and audio feature analysis require Spotify API credentials
+"""
+
+MOOD_COLORS = {
+    'Happy': '#4CAF50',
+    'Sad': '#2196F3',
+    'Angry': '#FF5722',
+    'Relaxed': '#8BC34A'
+}
+
+SESSION_TYPE_COLORS = {
+    'single_artist': '#6200ea',
+    'album_listening': '#3f51b5',
+    'variety': '#00897b',
+    'mixed': '#8d6e63'
+}
+
+CONTEXT_COLORS = {
+    'workout': '#f44336',
+    'commute': '#ff9800',
+    'work': '#2196f3',
+    'party': '#e91e63',
+    'relaxation': '#4caf50',
+    'other': '#9e9e9e'
+}
+
+MOOD_CLASSIFICATION_MD = """
+### Mood Classification
+Tracks are classified into moods based on their energy and valence (musical positiveness):
+- **Happy**: High energy + high valence (energetic and positive)
+- **Angry**: High energy + low valence (energetic but negative)
+- **Relaxed**: Low energy + high valence (calm and positive)
+- **Sad**: Low energy + low valence (calm and negative)
+"""
+
+SESSION_TYPES_MD = """
+#### Session Type Definitions
+- **Single Artist**: All tracks by the same artist
+- **Album Listening**: Consecutive tracks mostly by 1-2 artists
+- **Variety**: Many different artists with few repeats
+- **Mixed**: Other listening patterns
+"""
+
+CONTEXTS_MD = """
+This feature predicts the likely context of your listening sessions based on time patterns and audio features.
+Contexts include:
+- **Workout**: High-energy music during typical exercise hours
+- **Commute**: Music during weekday commuting hours
+- **Work**: Moderate-energy music during working hours
+- **Party**: High-energy music on weekend evenings
+- **Relaxation**: Low-energy music in the evenings
+"""
+
+FEATURE_EXPLANATIONS = {
+    'danceability': 'How suitable the track is for dancing (0.0 = least danceable, 1.0 = most danceable)',
+    'energy': 'Intensity and activity (0.0 = calm, 1.0 = energetic)',
+    'valence': 'Musical positiveness (0.0 = sad/negative, 1.0 = happy/positive)',
+    'acousticness': 'Confidence that the track is acoustic (0.0 = electric, 1.0 = acoustic)',
+    'instrumentalness': 'Predicts if a track has no vocals (0.0 = vocal, 1.0 = instrumental)',
+    'liveness': 'Presence of audience (0.0 = studio recording, 1.0 = live performance)',
+    'speechiness': 'Presence of spoken words (0.0 = music, 1.0 = speech)'
+}
+
+CONTEXT_EXPLANATIONS = {
+    'workout': "This is typical workout music - high energy at common exercise times.",
+    'commute': "This matches typical commute patterns during weekday rush hours.",
+    'work': "This is the kind of music people often listen to during work hours.",
+    'party': "This music and timing matches weekend party patterns.",
+    'relaxation': "This is typical evening relaxation music.",
+    'other': "This doesn't fit cleanly into a specific context pattern."
+}
+
+# Parsed upload sets kept in memory at once, shared by every session that uploads the same files
+MAX_CACHED_ANALYZERS = 4
+
+# Shared analyzers are written to by session tagging, context and mood labelling and
+# enrichment, so every step that writes to or reads back from one holds this lock
+_ANALYZER_LOCK = threading.RLock()
+
+@st.cache_resource(show_spinner=False, max_entries=MAX_CACHED_ANALYZERS)
+def _build_analyzer(files_key, _uploaded_files):
+    """Build the analyzer once per set of uploaded files instead of on every rerun"""
+    # Parse the uploads straight from memory, no need for temporary files
+    return SpotifyAnalyzer.from_buffers([uploaded_file.getbuffer() for uploaded_file in _uploaded_files])
+
+@st.cache_resource(show_spinner=False, max_entries=64)
+def analyzer_result(_analyzer, files_key, method_name, *args):
+    """Keep enrichment analyses, which the analyzer recomputes on every call, without pickling a copy per rerun"""
+    with _ANALYZER_LOCK:
+        return getattr(_analyzer, method_name)(*args)
+
+@st.cache_data(show_spinner=False)
+def session_analysis(_analyzer, files_key, gap_threshold):
+    """Detect sessions and compute everything the sessions tab shows in one cached step"""
+    # Hold the lock until the results are read, so no other session retags in between
+    with _ANALYZER_LOCK:
+        session_count = _analyzer.tag_sessions(gap_threshold=gap_threshold)
+        if not session_count:
+            return {"session_count": 0}
+        
+        return {
+            "session_count": session_count,
+            "statistics": _analyzer.session_statistics(),
+            "patterns": _analyzer.session_patterns(),
+            "content": _analyzer.session_content_analysis()
+        }
+
+@st.cache_data(show_spinner=False)
+def listening_contexts(_analyzer, context_key):
+    """Categorize listening contexts and compute their statistics in one cached step"""
+    with _ANALYZER_LOCK:
+        _analyzer.categorize_listening_contexts()
+        return _analyzer.context_statistics()
+
+@st.cache_resource(show_spinner="Training context predictor...", max_entries=MAX_CACHED_ANALYZERS)
+def context_predictor(_analyzer, context_key):
+    """Train the context model once, keeping it with the feature and context names it predicts with"""
+    with _ANALYZER_LOCK:
+        model = _analyzer.train_context_predictor()
+        return model, list(_analyzer.context_features), _analyzer.context_classes
+
+def predict_context(predictor, **features):
+    """Predict a context with a cached predictor rather than the model on the shared analyzer"""
+    model, feature_names, contexts = predictor
+    row = np.array([[features[name] for name in feature_names]], dtype=np.float32)
+    return contexts[model.predict(row)[0]]
+
+def series_frame(series, *columns):
+    """Lay out a result Series as named columns, one per index level plus the values"""
+    data = {}
+    for level, column in enumerate(columns[:-1]):
+        values = series.index.get_level_values(level)
+        if isinstance(values, pd.CategoricalIndex):
+            # Plotly groups by every category, so drop the ones with no rows
+            values = values.remove_unused_categories()
+        data[column] = values
+    data[columns[-1]] = series.to_numpy()
+    return pd.DataFrame(data)
+
+# Line charts with more points than this are thinned before plotting. Other charts
+# get aggregated input, where dropping rows would drop categories and change totals
+MAX_PLOT_ROWS = 10_000
+THINNED_CHARTS = ("line",)
+
+def _frame_digest(frame):
+    return tuple(frame.columns), pd.util.hash_pandas_object(frame, index=True).values.tobytes()
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_digest})
+def cached_figure(chart, data, layout=None, traces=None, **kwargs):
+    """Build a Plotly Express figure once per distinct data and options, so reruns skip trace building"""
+    if chart in THINNED_CHARTS and len(data) > MAX_PLOT_ROWS:
+        # Keep the payload sent to the browser bounded by thinning the series evenly
+        data = data.iloc[::len(data) // MAX_PLOT_ROWS + 1]
+    fig = getattr(px, chart)(data, **kwargs)
+    if layout:
+        fig.update_layout(**layout)
+    if traces:
+        fig.update_traces(**traces)
+    return fig
+
+@st.cache_data(show_spinner=False, hash_funcs={pd.DataFrame: _frame_digest})
+def hour_heatmap(by_hour, title, y_title):
+    """Heatmap of an hour × category matrix, drawn from the matrix instead of rebinning long-form rows"""
+    categories = by_hour.columns[::-1]
+    fig = go.Figure(go.Heatmap(
+        z=by_hour[categories].to_numpy().T,
+        x=by_hour.index,
+        y=categories.astype(str),
+        colorbar={"title": "Number of Tracks"},
+        hovertemplate="%{y}, %{x}:00<br>%{z}<extra></extra>"
+    ))
+    # A constant uirevision keeps the user's zoom when a rerun redraws the chart
+    fig.update_layout(title=title, xaxis_title="Hour of Day", yaxis_title=y_title, uirevision="constant")
+    return fig
+
+GENRE_TAG = '<span style="background-color: #9c89ff; margin: 2px; padding: 2px 8px; border-radius: 10px; color: white; display: inline-block;">{}</span>'
+
+@st.cache_data(show_spinner=False)
+def genre_tags_html(genres):
+    """Render the genre tag cloud in one join rather than growing a string per genre"""
+    tags = "".join(GENRE_TAG.format(genre) for genre in genres)
+    return f'<div style="max-height: 200px; overflow-y: auto;">{tags}</div>'
+
+ENRICHMENT_CACHE_DIR = "temp_spotify_data"
+ENRICHMENT_COLUMNS = ['genres', 'danceability', 'energy', 'key', 'loudness', 'mode',
+                      'speechiness', 'acousticness', 'instrumentalness',
+                      'liveness', 'valence', 'tempo']
+
+@st.cache_resource(show_spinner=False)
+def _api_cache():
+    """Open the Spotify API response cache once per server process"""
+    os.makedirs(ENRICHMENT_CACHE_DIR, exist_ok=True)
+    return shelve.open(os.path.join(ENRICHMENT_CACHE_DIR, "spotify_api_cache"))
+
+def spotify_client(client_id, client_secret):
+    """Connect to the Spotify API once per browser session, keeping the client off the shared analyzer"""
+    credentials = hashlib.blake2b(f"{client_id}:{client_secret}".encode(), digest_size=16).hexdigest()
+    connection = st.session_state.get("spotify_connection")
+    if connection is None or connection[0] != credentials:
+        import spotipy
+        from spotipy.oauth2 import SpotifyClientCredentials
+        
+        auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
+        connection = st.session_state["spotify_connection"] = (credentials, spotipy.Spotify(auth_manager=auth_manager))
+    return connection[1]
+
+def enrich(analyzer, method_name, sp):
+    """Run an API enrichment on the shared analyzer with this session's client, attached only for the call"""
+    with _ANALYZER_LOCK:
+        analyzer.sp = sp
+        analyzer.api_cache = _api_cache()
+        try:
+            getattr(analyzer, method_name)()
+        finally:
+            del analyzer.sp
+            del analyzer.api_cache
+
+def _enrichment_path(files_key):
+    return os.path.join(ENRICHMENT_CACHE_DIR, f"enriched_{files_key}.parquet")
+
+def load_enrichment(analyzer, files_key):
+    """Restore genre and audio feature columns fetched in an earlier session"""
+    # Only read the file once per analyzer, not on every rerun
+    loaded_key = f"enrichment_loaded_{files_key}"
+    if st.session_state.get(loaded_key) == id(analyzer):
+        return
+    st.session_state[loaded_key] = id(analyzer)
+    if all(column in analyzer.df.columns for column in ENRICHMENT_COLUMNS):
+        return
+    
+    path = _enrichment_path(files_key)
+    if not os.path.exists(path):
+        return
+    
+    try:
+        cached = pd.read_parquet(path)
+    except Exception as e:
+        st.sidebar.warning(f"Could not read cached enrichment data: {str(e)}")
+        return
+    
+    with _ANALYZER_LOCK:
+        for column in cached.columns:
+            if column not in analyzer.df.columns:
+                values = cached[column]
+                if column == 'genres':
+                    # Parquet hands list columns back as arrays
+                    values = values.map(lambda genres: list(genres) if genres is not None else [])
+                analyzer.df[column] = values
+
+def save_enrichment(analyzer, files_key):
+    """Persist the columns fetched from the Spotify API so restarts skip the API calls"""
+    columns = [column for column in ENRICHMENT_COLUMNS if column in analyzer.df.columns]
+    if not columns:
+        return
+    
+    try:
+        os.makedirs(ENRICHMENT_CACHE_DIR, exist_ok=True)
+        analyzer.df[columns].to_parquet(_enrichment_path(files_key), compression="zstd")
+    except Exception as e:
+        st.sidebar.warning(f"Could not cache enrichment data: {str(e)}")
+
 def main():
     st.set_page_config(
         page_title="Enhanced Spotify Listening Dashboard",
@@ -53,52 +331,33 @@ def main():
     
     if not uploaded_files:
         st.info("Please upload your Spotify data files to begin analysis.")
-        st.markdown("""
-        ### How to get your Spotify data:
-        1. Go to your Spotify account page: [Privacy Settings](https://www.spotify.com/account/privacy/)
-        2. Click on "Request your data"
-        3. You'll receive an email with a download link within a few days
-        4. Extract the ZIP file and look for files named like "StreamingHistory0.json"
-        5. Upload those files here!
-        
-        ### New Enhanced Features:
-        - 🎸 **Genre Analysis**: Discover your most listened genres and genre diversity
-        - 🎛️ **Audio Features Analysis**: Explore the acoustic characteristics of your music
-        - ⏱️ **Listening Session Analysis**: Understand your listening behavior patterns
-        - 🔮 **Context Prediction**: Identify when and why you listen to music
-        
-        Note: Genre and audio feature analysis require Spotify API credentials
-        """)
+        st.markdown(INSTRUCTIONS_MD)
         return
     
-    # Save uploaded files temporarily
-    temp_dir = "temp_spotify_data"
-    os.makedirs(temp_dir, exist_ok=True)
-    
-    temp_paths = []
+    # Hash the uploads so reruns reuse the same analyzer and results
+    hasher = hashlib.blake2b(digest_size=16)
     for uploaded_file in uploaded_files:
-        file_path = os.path.join(temp_dir, uploaded_file.name)
-        with open(file_path, "wb") as f:
-            f.write(uploaded_file.getbuffer())
-        temp_paths.append(file_path)
+        hasher.update(uploaded_file.getbuffer())
+    files_key = hasher.hexdigest()
     
     # Initialize analyzer with uploaded files
     try:
-        analyzer = SpotifyAnalyzer(temp_paths)
+        analyzer = _build_analyzer(files_key, uploaded_files)
+        load_enrichment(analyzer, files_key)
         
         # Connect to Spotify API if credentials are provided
-        api_connected = False
+        sp = None
         if client_id and client_secret:
             with st.spinner("Connecting to Spotify API..."):
                 try:
-                    analyzer.connect_to_spotify_api(client_id, client_secret)
-                    api_connected = True
+                    sp = spotify_client(client_id, client_secret)
                     st.sidebar.success("✅ Connected to Spotify API")
                 except Exception as e:
                     st.sidebar.error(f"Error connecting to Spotify API: {str(e)}")
         
-        # Create tabs for different analysis sections
-        tab_basic, tab_genres, tab_audio, tab_sessions, tab_context = st.tabs([
+        # Pick the analysis section in the sidebar. Unlike st.tabs, only the selected
+        # section runs, so API enrichment and session detection wait until they're viewed
+        view = st.sidebar.radio("View", [
             "Basic Stats", 
             "Genre Analysis", 
             "Audio Features", 
@@ -109,7 +368,7 @@ def main():
         # =====================
         # BASIC STATS TAB
         # =====================
-        with tab_basic:
+        if view == "Basic Stats":
             st.header("📊 Listening Overview")
             stats = analyzer.basic_stats()
             
@@ -141,34 +400,34 @@ def main():
                 top_artists = analyzer.top_artists(top_n)
                 
                 # Convert to dataframes for Plotly
-                artists_by_count = pd.DataFrame(top_artists["by_count"]).reset_index()
-                artists_by_count.columns = ["Artist", "Play Count"]
+                artists_by_count = series_frame(top_artists["by_count"], "Artist", "Play Count")
                 
-                artists_by_time = pd.DataFrame(top_artists["by_time"]).reset_index()
-                artists_by_time.columns = ["Artist", "Hours"]
+                artists_by_time = series_frame(top_artists["by_time"], "Artist", "Hours")
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    fig = px.bar(
+                    fig = cached_figure(
+                        "bar",
                         artists_by_count, 
                         x="Play Count", 
                         y="Artist", 
                         orientation='h',
-                        title="By Play Count"
+                        title="By Play Count",
+                        layout=dict(yaxis={'categoryorder':'total ascending'})
                     )
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
-                    fig = px.bar(
+                    fig = cached_figure(
+                        "bar",
                         artists_by_time, 
                         x="Hours", 
                         y="Artist", 
                         orientation='h',
-                        title="By Hours Listened"
+                        title="By Hours Listened",
+                        layout=dict(yaxis={'categoryorder':'total ascending'})
                     )
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
                     st.plotly_chart(fig, use_container_width=True)
             
             with tab2:
@@ -176,36 +435,36 @@ def main():
                 top_tracks = analyzer.top_tracks(top_n)
                 
                 # Convert to dataframes for Plotly
-                tracks_by_count = pd.DataFrame(top_tracks["by_count"]).reset_index()
-                tracks_by_count.columns = ["Track", "Artist", "Play Count"]
+                tracks_by_count = series_frame(top_tracks["by_count"], "Track", "Artist", "Play Count")
                 tracks_by_count["Label"] = tracks_by_count["Track"] + " - " + tracks_by_count["Artist"]
                 
-                tracks_by_time = pd.DataFrame(top_tracks["by_time"]).reset_index()
-                tracks_by_time.columns = ["Track", "Artist", "Hours"]
+                tracks_by_time = series_frame(top_tracks["by_time"], "Track", "Artist", "Hours")
                 tracks_by_time["Label"] = tracks_by_time["Track"] + " - " + tracks_by_time["Artist"]
                 
                 col1, col2 = st.columns(2)
                 
                 with col1:
-                    fig = px.bar(
+                    fig = cached_figure(
+                        "bar",
                         tracks_by_count, 
                         x="Play Count", 
                         y="Label", 
                         orientation='h',
-                        title="By Play Count"
+                        title="By Play Count",
+                        layout=dict(yaxis={'categoryorder':'total ascending'})
                     )
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
                     st.plotly_chart(fig, use_container_width=True)
                 
                 with col2:
-                    fig = px.bar(
+                    fig = cached_figure(
+                        "bar",
                         tracks_by_time, 
                         x="Hours", 
                         y="Label", 
                         orientation='h',
-                        title="By Hours Listened"
+                        title="By Hours Listened",
+                        layout=dict(yaxis={'categoryorder':'total ascending'})
                     )
-                    fig.update_layout(yaxis={'categoryorder':'total ascending'})
                     st.plotly_chart(fig, use_container_width=True)
             
             # Show original dashboard sections (patterns, streaks, diversity)
@@ -214,17 +473,18 @@ def main():
         # =====================
         # GENRE ANALYSIS TAB
         # =====================
-        with tab_genres:
+        if view == "Genre Analysis":
             st.header("🎸 Genre Analysis")
             
-            if not api_connected:
+            if sp is None:
                 st.warning("Genre analysis requires Spotify API connection. Please provide your API credentials in the sidebar.")
             else:
                 # Check if genre data already exists, if not, fetch it
                 if 'genres' not in analyzer.df.columns:
                     with st.spinner("Fetching genre data from Spotify API..."):
                         try:
-                            analyzer.enrich_with_genres()
+                            enrich(analyzer, "enrich_with_genres", sp)
+                            save_enrichment(analyzer, files_key)
                             st.success("Successfully retrieved genre data!")
                         except Exception as e:
                             st.error(f"Error fetching genre data: {str(e)}")
@@ -237,44 +497,44 @@ def main():
                     top_n = st.slider("Number of top genres to display", 5, 20, 10, key="genre_slider")
                     
                     with st.spinner("Analyzing genre data..."):
-                        top_genres = analyzer.top_genres(limit=top_n)
+                        top_genres = analyzer_result(analyzer, files_key, "top_genres", top_n)
                         
                         # Convert to dataframes for Plotly
-                        genres_by_count = pd.DataFrame(top_genres["by_count"]).reset_index()
-                        genres_by_count.columns = ["Genre", "Play Count"]
+                        genres_by_count = series_frame(top_genres["by_count"], "Genre", "Play Count")
                         
-                        genres_by_time = pd.DataFrame(top_genres["by_time"]).reset_index()
-                        genres_by_time.columns = ["Genre", "Hours"]
+                        genres_by_time = series_frame(top_genres["by_time"], "Genre", "Hours")
                         
                         col1, col2 = st.columns(2)
                         
                         with col1:
-                            fig = px.bar(
+                            fig = cached_figure(
+                                "bar",
                                 genres_by_count, 
                                 x="Play Count", 
                                 y="Genre", 
                                 orientation='h',
-                                title="Top Genres by Play Count"
+                                title="Top Genres by Play Count",
+                                layout=dict(yaxis={'categoryorder':'total ascending'})
                             )
-                            fig.update_layout(yaxis={'categoryorder':'total ascending'})
                             st.plotly_chart(fig, use_container_width=True)
                         
                         with col2:
-                            fig = px.bar(
+                            fig = cached_figure(
+                                "bar",
                                 genres_by_time, 
                                 x="Hours", 
                                 y="Genre", 
                                 orientation='h',
-                                title="Top Genres by Hours Listened"
+                                title="Top Genres by Hours Listened",
+                                layout=dict(yaxis={'categoryorder':'total ascending'})
                             )
-                            fig.update_layout(yaxis={'categoryorder':'total ascending'})
                             st.plotly_chart(fig, use_container_width=True)
                     
                     # Genre Diversity
                     st.subheader("Genre Diversity")
                     
                     with st.spinner("Calculating genre diversity..."):
-                        diversity = analyzer.genre_diversity()
+                        diversity = analyzer_result(analyzer, files_key, "genre_diversity")
                         
                         col1, col2 = st.columns(2)
                         
@@ -283,43 +543,40 @@ def main():
                             
                             # Show all genres as tags
                             st.markdown("### All Genres")
-                            genre_html = ""
-                            for genre in sorted(diversity["all_genres"]):
-                                genre_html += f'<span style="background-color: #9c89ff; margin: 2px; padding: 2px 8px; border-radius: 10px; color: white; display: inline-block;">{genre}</span>'
-                            st.markdown(f'<div style="max-height: 200px; overflow-y: auto;">{genre_html}</div>', unsafe_allow_html=True)
+                            st.markdown(genre_tags_html(tuple(sorted(diversity["all_genres"]))), unsafe_allow_html=True)
                         
                         # Monthly unique genres chart
                         with col2:
                             if not diversity["monthly_unique"].empty:
-                                monthly_unique_df = pd.DataFrame(diversity["monthly_unique"]).reset_index()
-                                monthly_unique_df.columns = ["Year", "Month", "Unique Genres"]
+                                monthly_unique_df = series_frame(diversity["monthly_unique"], "Year", "Month", "Unique Genres")
                                 monthly_unique_df["YearMonth"] = monthly_unique_df["Year"].astype(str) + "-" + monthly_unique_df["Month"].astype(str).str.zfill(2)
                                 
-                                fig = px.bar(
+                                fig = cached_figure(
+                                    "bar",
                                     monthly_unique_df, 
                                     x="YearMonth", 
                                     y="Unique Genres",
-                                    title="Unique Genres per Month"
+                                    title="Unique Genres per Month",
+                                    layout=dict(xaxis_tickangle=-45)
                                 )
-                                fig.update_layout(xaxis_tickangle=-45)
                                 st.plotly_chart(fig, use_container_width=True)
                     
                     # Genre Discovery
                     st.subheader("Genre Discovery")
                     
                     if not diversity["monthly_discovery_ratio"].empty:
-                        discovery_df = pd.DataFrame(diversity["monthly_discovery_ratio"]).reset_index()
-                        discovery_df.columns = ["Year", "Month", "Discovery Ratio"]
+                        discovery_df = series_frame(diversity["monthly_discovery_ratio"], "Year", "Month", "Discovery Ratio")
                         discovery_df["YearMonth"] = discovery_df["Year"].astype(str) + "-" + discovery_df["Month"].astype(str).str.zfill(2)
                         
-                        fig = px.bar(
+                        fig = cached_figure(
+                            "bar",
                             discovery_df, 
                             x="YearMonth", 
                             y="Discovery Ratio",
                             title="New Genre Discovery Ratio by Month",
-                            range_y=[0, 1]
+                            range_y=[0, 1],
+                            layout=dict(xaxis_tickangle=-45)
                         )
-                        fig.update_layout(xaxis_tickangle=-45)
                         st.plotly_chart(fig, use_container_width=True)
                         
                         st.info("The discovery ratio shows the proportion of new genres you listened to each month. A higher value means you explored more new genres.")
@@ -327,10 +584,10 @@ def main():
         # =====================
         # AUDIO FEATURES TAB
         # =====================
-        with tab_audio:
+        if view == "Audio Features":
             st.header("🎛️ Audio Features Analysis")
             
-            if not api_connected:
+            if sp is None:
                 st.warning("Audio features analysis requires Spotify API connection. Please provide your API credentials in the sidebar.")
             else:
                 # Check if audio features already exist, if not, fetch them
@@ -338,7 +595,8 @@ def main():
                 if not any(feature in analyzer.df.columns for feature in required_features):
                     with st.spinner("Fetching audio features from Spotify API..."):
                         try:
-                            analyzer.enrich_with_audio_features()
+                            enrich(analyzer, "enrich_with_audio_features", sp)
+                            save_enrichment(analyzer, files_key)
                             st.success("Successfully retrieved audio features!")
                         except Exception as e:
                             st.error(f"Error fetching audio features: {str(e)}")
@@ -350,7 +608,7 @@ def main():
                     st.subheader("Average Audio Features")
                     
                     with st.spinner("Calculating average audio features..."):
-                        avg_features = analyzer.average_audio_features()
+                        avg_features = analyzer_result(analyzer, files_key, "average_audio_features")
                         
                         # Select features to display
                         display_features = ['danceability', 'energy', 'valence', 'acousticness', 
@@ -366,109 +624,72 @@ def main():
                             radar_df = pd.DataFrame(radar_data)
                             
                             # Create radar chart using plotly
-                            fig = px.line_polar(
+                            fig = cached_figure(
+                                "line_polar",
                                 radar_df, 
                                 r='Value', 
                                 theta='Feature', 
                                 line_close=True,
-                                range_r=[0, 1]
+                                range_r=[0, 1],
+                                traces=dict(fill='toself')
                             )
-                            fig.update_traces(fill='toself')
                             st.plotly_chart(fig, use_container_width=True)
                             
                             # Display feature explanations
                             st.markdown("### Audio Feature Explanations")
-                            feature_explanations = {
-                                'danceability': 'How suitable the track is for dancing (0.0 = least danceable, 1.0 = most danceable)',
-                                'energy': 'Intensity and activity (0.0 = calm, 1.0 = energetic)',
-                                'valence': 'Musical positiveness (0.0 = sad/negative, 1.0 = happy/positive)',
-                                'acousticness': 'Confidence that the track is acoustic (0.0 = electric, 1.0 = acoustic)',
-                                'instrumentalness': 'Predicts if a track has no vocals (0.0 = vocal, 1.0 = instrumental)',
-                                'liveness': 'Presence of audience (0.0 = studio recording, 1.0 = live performance)',
-                                'speechiness': 'Presence of spoken words (0.0 = music, 1.0 = speech)'
-                            }
-                            
                             for feature in available_display:
-                                st.markdown(f"**{feature.capitalize()}**: {feature_explanations.get(feature, '')}")
+                                st.markdown(f"**{feature.capitalize()}**: {FEATURE_EXPLANATIONS.get(feature, '')}")
                     
                     # Mood Analysis
                     st.subheader("Mood Analysis")
                     
                     with st.spinner("Analyzing mood patterns..."):
                         # Classify moods if not already done
-                        if 'mood' not in analyzer.df.columns:
-                            analyzer.classify_moods()
+                        with _ANALYZER_LOCK:
+                            if 'mood' not in analyzer.df.columns:
+                                analyzer.classify_moods()
                         
-                        mood_data = analyzer.mood_analysis()
+                        mood_data = analyzer_result(analyzer, files_key, "mood_analysis")
                         
                         if not mood_data["by_count"].empty:
                             # Mood distribution
-                            mood_counts = pd.DataFrame(mood_data["by_count"]).reset_index()
-                            mood_counts.columns = ["Mood", "Count"]
+                            mood_counts = series_frame(mood_data["by_count"], "Mood", "Count")
                             
                             # Mood by time
-                            mood_time = pd.DataFrame(mood_data["by_time"]).reset_index()
-                            mood_time.columns = ["Mood", "Minutes"]
+                            mood_time = series_frame(mood_data["by_time"], "Mood", "Minutes")
                             
                             col1, col2 = st.columns(2)
                             
                             with col1:
-                                fig = px.pie(
+                                fig = cached_figure(
+                                    "pie",
                                     mood_counts, 
                                     values='Count', 
                                     names='Mood',
                                     title="Mood Distribution by Track Count",
-                                    color_discrete_map={
-                                        'Happy': '#4CAF50',
-                                        'Sad': '#2196F3',
-                                        'Angry': '#FF5722',
-                                        'Relaxed': '#8BC34A'
-                                    }
+                                    color_discrete_map=MOOD_COLORS
                                 )
                                 st.plotly_chart(fig, use_container_width=True)
                             
                             with col2:
-                                fig = px.pie(
+                                fig = cached_figure(
+                                    "pie",
                                     mood_time, 
                                     values='Minutes', 
                                     names='Mood',
                                     title="Mood Distribution by Listening Time",
-                                    color_discrete_map={
-                                        'Happy': '#4CAF50',
-                                        'Sad': '#2196F3',
-                                        'Angry': '#FF5722',
-                                        'Relaxed': '#8BC34A'
-                                    }
+                                    color_discrete_map=MOOD_COLORS
                                 )
                                 st.plotly_chart(fig, use_container_width=True)
                             
                             # Mood explanation
-                            st.markdown("""
-                            ### Mood Classification
-                            Tracks are classified into moods based on their energy and valence (musical positiveness):
-                            - **Happy**: High energy + high valence (energetic and positive)
-                            - **Angry**: High energy + low valence (energetic but negative)
-                            - **Relaxed**: Low energy + high valence (calm and positive)
-                            - **Sad**: Low energy + low valence (calm and negative)
-                            """)
+                            st.markdown(MOOD_CLASSIFICATION_MD)
                         
                         # Mood by hour heatmap
                         if "by_hour" in mood_data and not mood_data["by_hour"].empty:
                             st.subheader("Mood by Hour of Day")
                             
-                            # Convert to format needed for Plotly
-                            hour_mood_df = mood_data["by_hour"].reset_index()
-                            hour_mood_melted = pd.melt(hour_mood_df, id_vars='hour', var_name='Mood', value_name='Count')
-                            
-                            fig = px.density_heatmap(
-                                hour_mood_melted,
-                                x='hour',
-                                y='Mood',
-                                z='Count',
-                                title="When You Listen to Different Moods",
-                                labels={"hour": "Hour of Day", "Count": "Number of Tracks"}
-                            )
-                            fig.update_layout(yaxis_categoryorder='category descending')
+                            fig = hour_heatmap(mood_data["by_hour"], "When You Listen to Different Moods", "Mood")
                             st.plotly_chart(fig, use_container_width=True)
                     
                     # Audio Features Over Time
@@ -485,23 +706,23 @@ def main():
                         )
                         
                         with st.spinner(f"Tracking {selected_feature} over time..."):
-                            feature_over_time = analyzer.audio_features_over_time(selected_feature)
+                            feature_over_time = analyzer_result(analyzer, files_key, "audio_features_over_time", selected_feature)
                             
                             if not feature_over_time.empty:
                                 # Convert to dataframe for plotting
-                                feature_df = pd.DataFrame(feature_over_time).reset_index()
-                                feature_df.columns = ["Year", "Month", "Value"]
+                                feature_df = series_frame(feature_over_time, "Year", "Month", "Value")
                                 feature_df["YearMonth"] = feature_df["Year"].astype(str) + "-" + feature_df["Month"].astype(str).str.zfill(2)
                                 
-                                fig = px.line(
+                                fig = cached_figure(
+                                    "line",
                                     feature_df,
                                     x="YearMonth",
                                     y="Value",
                                     title=f"{selected_feature.capitalize()} Over Time",
                                     labels={"Value": selected_feature.capitalize()},
-                                    markers=True
+                                    markers=True,
+                                    layout=dict(xaxis_tickangle=-45)
                                 )
-                                fig.update_layout(xaxis_tickangle=-45)
                                 st.plotly_chart(fig, use_container_width=True)
                                 
                                 st.info(f"This chart shows how your preference for {selected_feature} has changed over time.")
@@ -509,7 +730,7 @@ def main():
         # =====================
         # LISTENING SESSIONS TAB
         # =====================
-        with tab_sessions:
+        if view == "Listening Sessions":
             st.header("⏱️ Listening Session Analysis")
             
             # Session detection settings
@@ -524,13 +745,13 @@ def main():
             )
             
             with st.spinner("Detecting listening sessions..."):
-                sessions = analyzer.detect_sessions(gap_threshold=gap_threshold)
+                session_data = session_analysis(analyzer, files_key, gap_threshold)
                 
                 # Session count and stats
-                if sessions:
-                    st.success(f"Detected {len(sessions)} listening sessions with a {gap_threshold}-minute gap threshold")
+                if session_data["session_count"]:
+                    st.success(f"Detected {session_data['session_count']} listening sessions with a {gap_threshold}-minute gap threshold")
                     
-                    stats = analyzer.session_statistics()
+                    stats = session_data["statistics"]
                     
                     # Display session statistics in columns
                     col1, col2, col3 = st.columns(3)
@@ -548,22 +769,14 @@ def main():
                     st.subheader("Session Length Distribution")
                     
                     if stats['session_length_distribution']:
-                        # Convert to DataFrame for plotting
+                        # session_statistics already orders the bins from shortest to longest
                         length_dist = pd.DataFrame({
                             'Duration': list(stats['session_length_distribution'].keys()),
                             'Sessions': list(stats['session_length_distribution'].values())
                         })
                         
-                        # Sort by duration categories
-                        duration_order = ['0-15min', '15-30min', '30-60min', '60-120min', '120-240min', '240min+']
-                        length_dist['Duration'] = pd.Categorical(
-                            length_dist['Duration'], 
-                            categories=duration_order, 
-                            ordered=True
-                        )
-                        length_dist = length_dist.sort_values('Duration')
-                        
-                        fig = px.bar(
+                        fig = cached_figure(
+                            "bar",
                             length_dist,
                             x='Duration',
                             y='Sessions',
@@ -575,7 +788,7 @@ def main():
                     # Session start times
                     st.subheader("When Do Your Sessions Start?")
                     
-                    patterns = analyzer.session_patterns()
+                    patterns = session_data["patterns"]
                     
                     col1, col2 = st.columns(2)
                     
@@ -586,33 +799,26 @@ def main():
                             'Sessions': list(patterns['by_hour'].values())
                         })
                         
-                        fig = px.bar(
+                        fig = cached_figure(
+                            "bar",
                             hour_data,
                             x='Hour',
                             y='Sessions',
                             title='Sessions by Hour of Day',
-                            color_discrete_sequence=['#7c83fd']
+                            color_discrete_sequence=['#7c83fd'],
+                            layout=dict(xaxis=dict(tickmode='linear', tick0=0, dtick=2))
                         )
-                        fig.update_layout(xaxis=dict(tickmode='linear', tick0=0, dtick=2))
                         st.plotly_chart(fig, use_container_width=True)
                     
                     with col2:
-                        # Weekday distribution
+                        # Weekday distribution, session_patterns already lists Monday to Sunday
                         weekday_data = pd.DataFrame({
                             'Weekday': list(patterns['by_weekday'].keys()),
                             'Sessions': list(patterns['by_weekday'].values())
                         })
                         
-                        # Ensure correct weekday order
-                        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-                        weekday_data['Weekday'] = pd.Categorical(
-                            weekday_data['Weekday'], 
-                            categories=day_order, 
-                            ordered=True
-                        )
-                        weekday_data = weekday_data.sort_values('Weekday')
-                        
-                        fig = px.bar(
+                        fig = cached_figure(
+                            "bar",
                             weekday_data,
                             x='Weekday',
                             y='Sessions',
@@ -624,7 +830,7 @@ def main():
                     # Session content analysis
                     st.subheader("Session Content Analysis")
                     
-                    content = analyzer.session_content_analysis()
+                    content = session_data["content"]
                     
                     col1, col2 = st.columns(2)
                     
@@ -636,17 +842,13 @@ def main():
                                 'Count': list(content['session_types'].values())
                             })
                             
-                            fig = px.pie(
+                            fig = cached_figure(
+                                "pie",
                                 type_data,
                                 values='Count',
                                 names='Type',
                                 title='Session Types',
-                                color_discrete_map={
-                                    'single_artist': '#6200ea',
-                                    'album_listening': '#3f51b5',
-                                    'variety': '#00897b',
-                                    'mixed': '#8d6e63'
-                                }
+                                color_discrete_map=SESSION_TYPE_COLORS
                             )
                             st.plotly_chart(fig, use_container_width=True)
                     
@@ -666,43 +868,33 @@ def main():
                             help="Average ratio of unique artists to total tracks in a session"
                         )
                         
-                        st.markdown("""
-                        #### Session Type Definitions
-                        - **Single Artist**: All tracks by the same artist
-                        - **Album Listening**: Consecutive tracks mostly by 1-2 artists
-                        - **Variety**: Many different artists with few repeats
-                        - **Mixed**: Other listening patterns
-                        """)
+                        st.markdown(SESSION_TYPES_MD)
         
         # =====================
         # LISTENING CONTEXT TAB
         # =====================
-        with tab_context:
+        if view == "Listening Context":
             st.header("🔮 Listening Context Prediction")
             
             # Add context categories
-            st.markdown("""
-            This feature predicts the likely context of your listening sessions based on time patterns and audio features.
-            Contexts include:
-            - **Workout**: High-energy music during typical exercise hours
-            - **Commute**: Music during weekday commuting hours
-            - **Work**: Moderate-energy music during working hours
-            - **Party**: High-energy music on weekend evenings
-            - **Relaxation**: Low-energy music in the evenings
-            """)
+            st.markdown(CONTEXTS_MD)
             
             with st.spinner("Categorizing listening contexts..."):
+                # Contexts use energy and tempo once audio features are fetched,
+                # so those are part of the cache key along with the files
+                has_audio_features = all(col in analyzer.df.columns for col in ['energy', 'tempo'])
+                context_key = (files_key, has_audio_features)
+                
                 # Categorize contexts
-                analyzer.categorize_listening_contexts()
-                context_stats = analyzer.context_statistics()
+                context_stats = listening_contexts(analyzer, context_key)
+                distribution = context_stats["distribution"]
                 
                 # Context distribution
                 st.subheader("Listening Context Distribution")
                 
-                if not context_stats["distribution"].empty:
+                if not distribution.empty:
                     # Convert to DataFrame for plotting
-                    context_dist = pd.DataFrame(context_stats["distribution"]).reset_index()
-                    context_dist.columns = ["Context", "Proportion"]
+                    context_dist = series_frame(distribution, "Context", "Proportion")
                     
                     # Convert proportion to percentage
                     context_dist["Percentage"] = context_dist["Proportion"] * 100
@@ -710,63 +902,34 @@ def main():
                     col1, col2 = st.columns(2)
                     
                     with col1:
-                        fig = px.pie(
+                        fig = cached_figure(
+                            "pie",
                             context_dist,
                             values='Proportion',
                             names='Context',
                             title='Distribution of Listening Contexts',
-                            color_discrete_map={
-                                'workout': '#f44336',
-                                'commute': '#ff9800',
-                                'work': '#2196f3',
-                                'party': '#e91e63',
-                                'relaxation': '#4caf50',
-                                'other': '#9e9e9e'
-                            }
+                            color_discrete_map=CONTEXT_COLORS
                         )
                         st.plotly_chart(fig, use_container_width=True)
                     
                     with col2:
-                        fig = px.bar(
+                        fig = cached_figure(
+                            "bar",
                             context_dist,
                             x='Context',
                             y='Percentage',
                             title='Percentage of Listening by Context',
                             color='Context',
-                            color_discrete_map={
-                                'workout': '#f44336',
-                                'commute': '#ff9800',
-                                'work': '#2196f3',
-                                'party': '#e91e63',
-                                'relaxation': '#4caf50',
-                                'other': '#9e9e9e'
-                            }
+                            color_discrete_map=CONTEXT_COLORS,
+                            layout=dict(yaxis_title="Percentage (%)")
                         )
-                        fig.update_layout(yaxis_title="Percentage (%)")
                         st.plotly_chart(fig, use_container_width=True)
                 
                 # Context by time of day heatmap
                 st.subheader("Context by Time of Day")
                 
                 if "by_hour" in context_stats and not context_stats["by_hour"].empty:
-                    # Convert to format needed for Plotly
-                    hour_context_df = context_stats["by_hour"].reset_index()
-                    hour_context_melted = pd.melt(
-                        hour_context_df, 
-                        id_vars='hour', 
-                        var_name='Context', 
-                        value_name='Count'
-                    )
-                    
-                    fig = px.density_heatmap(
-                        hour_context_melted,
-                        x='hour',
-                        y='Context',
-                        z='Count',
-                        title="When Different Contexts Occur",
-                        labels={"hour": "Hour of Day", "Count": "Number of Tracks"}
-                    )
-                    fig.update_layout(yaxis_categoryorder='category descending')
+                    fig = hour_heatmap(context_stats["by_hour"], "When Different Contexts Occur", "Context")
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Context recommendations
@@ -774,7 +937,7 @@ def main():
                 
                 # Context selector
                 context_options = [c for c in ['workout', 'commute', 'work', 'party', 'relaxation'] 
-                                  if c in context_stats["distribution"].index]
+                                  if c in distribution.index]
                 
                 if context_options:
                     selected_context = st.selectbox(
@@ -784,16 +947,17 @@ def main():
                     )
                     
                     with st.spinner(f"Finding recommendations for {selected_context}..."):
-                        suggestions = analyzer.suggest_for_context(selected_context, limit=10)
+                        suggestions = analyzer_result(analyzer, context_key, "suggest_for_context", selected_context, 10)
                         
                         if suggestions:
                             st.markdown(f"### Top tracks for {selected_context.capitalize()}")
                             
-                            # Display suggestions as a table
-                            suggestion_df = pd.DataFrame(suggestions)
+                            # Display suggestions as a table, with the columns named up front
+                            # rather than inferred from the dict keys
+                            suggestion_df = pd.DataFrame.from_records(suggestions, columns=["track", "artist", "count"])
                             suggestion_df.columns = ["Track", "Artist", "Times Played"]
                             
-                            st.dataframe(suggestion_df, use_container_width=True)
+                            st.dataframe(suggestion_df, use_container_width=True, hide_index=True)
                             
                             st.info("These suggestions are based on your most frequently played tracks in this context.")
                         else:
@@ -804,9 +968,6 @@ def main():
                 st.markdown("Try predicting the context for a specific time and music style:")
                 
                 try:
-                    # Train the predictor model
-                    analyzer.train_context_predictor()
-                    
                     # Create input form
                     with st.form("context_predictor"):
                         col1, col2 = st.columns(2)
@@ -840,23 +1001,16 @@ def main():
                         if 'tempo' in analyzer.df.columns:
                             predict_kwargs['tempo'] = tempo
                         
+                        # Train the predictor model the first time a prediction is asked for
+                        predictor = context_predictor(analyzer, context_key)
+                        
                         # Make prediction
-                        predicted = analyzer.predict_context(**predict_kwargs)
+                        predicted = predict_context(predictor, **predict_kwargs)
                         
                         # Display result
                         st.success(f"Predicted context: **{predicted.upper()}**")
                         
-                        # Context explanation
-                        context_explanations = {
-                            'workout': "This is typical workout music - high energy at common exercise times.",
-                            'commute': "This matches typical commute patterns during weekday rush hours.",
-                            'work': "This is the kind of music people often listen to during work hours.",
-                            'party': "This music and timing matches weekend party patterns.",
-                            'relaxation': "This is typical evening relaxation music.",
-                            'other': "This doesn't fit cleanly into a specific context pattern."
-                        }
-                        
-                        st.info(context_explanations.get(predicted, ""))
+                        st.info(CONTEXT_EXPLANATIONS.get(predicted, ""))
                 
                 except Exception as e:
                     if "scikit-learn is required" in str(e):
@@ -864,13 +1018,6 @@ def main():
                     else:
                         st.error(f"Error in context prediction: {str(e)}")
         
-        # Clean up temporary files
-        for file_path in temp_paths:
-            try:
-                os.remove(file_path)
-            except:
-                pass
-            
     except Exception as e:
         st.error(f"Error analyzing data: {str(e)}")
         st.exception(e)
@@ -1,91 +1,345 @@
 import json
 import os
-import glob
 import requests
 import time
 import base64
+import re
+import shelve
+import threading
+import unicodedata
+import pandas as pd
 import lyricsgenius
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
 from urllib.parse import quote
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+
+    def _json_dumps(data):
+        # orjson writes UTF-8 directly, like json.dump with ensure_ascii=False
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+
+    _json_line = orjson.dumps
+except ImportError:  # orjson is optional, fall back to the stdlib encoder
+    def _json_dumps(data):
+        return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+    def _json_line(data):
+        return json.dumps(data, ensure_ascii=False).encode('utf-8')
+
+# Number of Genius lookups in flight at once
+GENIUS_WORKERS = 5
+
+# Genius requests allowed per second across all workers, and how often a
+# rate limited (429) request is retried
+GENIUS_RATE = 5
+GENIUS_MAX_RETRIES = 3
+
+# Seconds to wait for Genius to answer a search
+GENIUS_TIMEOUT = 10
+
+# Seconds to wait for Spotify to answer a track search
+SPOTIFY_TIMEOUT = 10
+
+# Search results are kept here between runs, for GENIUS_CACHE_TTL seconds.
+# Songs Genius had no match for are searched again after GENIUS_MISS_TTL
+GENIUS_CACHE_FILE = ".genius_cache"
+GENIUS_CACHE_TTL = 30 * 86400
+GENIUS_MISS_TTL = 86400
+
+# Number of history entries aggregated at a time
+PLAY_BATCH_SIZE = 100_000
+
+# Whitespace and commas between the items of a JSON array
+_JSON_SEPARATORS = re.compile(r'[\s,]*')
+_JSON_WHITESPACE = re.compile(r'\s*')
+_JSON_DELIMITERS = frozenset(' \t\n\r,]')
+
+class TokenBucket:
+    """Thread-safe rate limiter allowing rate requests per second, in bursts of up to capacity"""
+    def __init__(self, rate, capacity=None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def acquire(self):
+        """Block until a request may be sent"""
+        with self._lock:
+            self._refill()
+            # A negative balance reserves a later slot, so waiting callers queue up fairly
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+    
+    def pause(self, seconds):
+        """Hold back every caller for the given number of seconds"""
+        with self._lock:
+            self._refill()
+            # Leave one token's worth so the next request goes out seconds from now
+            self.tokens = min(self.tokens, 1) - seconds * self.rate
+
+def _retry_after(response, default=1.0):
+    """Seconds to wait according to a Retry-After header given in seconds"""
+    try:
+        return max(float(response.headers.get('Retry-After', default)), 0)
+    except ValueError:
+        return default
 
 class GeniusLyricsFinder:
-    def __init__(self, client_access_token):
+    def __init__(self, client_access_token, cache=None, rate_limiter=None):
         self.base_url = "https://api.genius.com"
         self.headers = {
             'Authorization': f'Bearer {client_access_token}'
         }
+        # One pooled session keeps connections alive between searches. Server
+        # errors are retried by the adapter, 429s are left to the rate limiter
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = HTTPAdapter(
+            pool_maxsize=GENIUS_WORKERS,
+            max_retries=Retry(total=GENIUS_MAX_RETRIES, backoff_factor=0.3, status_forcelist=[500, 502, 503, 504])
+        )
+        self.session.mount('https://', adapter)
+        # Optional dict-like store (e.g. a shelve) of earlier search results
+        self.cache = cache
+        self._cache_lock = threading.Lock()
+        # Shared by every thread searching with this finder
+        self.rate_limiter = rate_limiter or TokenBucket(GENIUS_RATE)
+    
+    @staticmethod
+    def _cache_key(artist_name, track_name):
+        """Normalize names so case and Unicode variants share a cache entry"""
+        return "|".join(unicodedata.normalize("NFKC", name).casefold().strip() for name in (artist_name, track_name))
         
     def search_song(self, artist_name, track_name):
         """Search for a song on Genius"""
+        key = self._cache_key(artist_name, track_name)
+        if self.cache is not None:
+            with self._cache_lock:
+                entry = self.cache.get(key)
+            # Entries are (song, time stored); expired ones are searched again
+            if isinstance(entry, tuple):
+                song, stored = entry
+                ttl = GENIUS_CACHE_TTL if song is not None else GENIUS_MISS_TTL
+                if time.time() - stored < ttl:
+                    return song
+        
         search_url = f"{self.base_url}/search"
         search_term = f"{artist_name} {track_name}"
         params = {'q': search_term}
         
-        try:
-            response = requests.get(search_url, headers=self.headers, params=params)
-            response.raise_for_status()
-            data = response.json()
-            
-            if 'response' in data and 'hits' in data['response']:
-                for hit in data['response']['hits']:
-                    result = hit['result']
-                    # Check if the artist name is in the result
-                    if artist_name.lower() in result['primary_artist']['name'].lower():
-                        return {
-                            'title': result['title'],
-                            'artist': result['primary_artist']['name'],
-                            'lyrics_url': result['url'],
-                            'song_id': result['id']
-                        }
-            return None
-        except requests.exceptions.RequestException as e:
-            print(f"Error searching for lyrics: {e}")
-            return None
+        for attempt in range(GENIUS_MAX_RETRIES + 1):
+            self.rate_limiter.acquire()
+            try:
+                response = self.session.get(search_url, params=params, timeout=GENIUS_TIMEOUT)
+                if response.status_code == 429 and attempt < GENIUS_MAX_RETRIES:
+                    # Rate limited, back off as long as Genius asks before trying again
+                    self.rate_limiter.pause(_retry_after(response))
+                    continue
+                response.raise_for_status()
+                data = response.json()
+            except requests.exceptions.RequestException as e:
+                print(f"Error searching for lyrics: {e}")
+                return None
+            break
+        
+        song = None
+        if 'response' in data and 'hits' in data['response']:
+            for hit in data['response']['hits']:
+                result = hit['result']
+                # Check if the artist name is in the result
+                if artist_name.lower() in result['primary_artist']['name'].lower():
+                    song = {
+                        'title': result['title'],
+                        'artist': result['primary_artist']['name'],
+                        'lyrics_url': result['url'],
+                        'song_id': result['id']
+                    }
+                    break
+        
+        # Songs without a match are cached too, but expire sooner in case Genius adds them
+        if self.cache is not None:
+            with self._cache_lock:
+                self.cache[key] = (song, time.time())
+        return song
+
+def write_json(file_path, data):
+    """Write data as indented UTF-8 JSON"""
+    with open(file_path, 'wb') as file:
+        file.write(_json_dumps(data))
+
+def iter_json_array(file_path, chunk_size=1 << 20):
+    """Yield the items of a top-level JSON array, reading the file in chunks"""
+    decoder = json.JSONDecoder()
+    with open(file_path, 'r', encoding='utf-8') as file:
+        buffer = ''
+        pos = 0
+        eof = False
+        
+        def read_more():
+            # Drop what has been consumed and append the next chunk
+            nonlocal buffer, pos, eof
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer = buffer[pos:] + chunk
+            pos = 0
+        
+        # Leading whitespace may span several chunks
+        while True:
+            pos = _JSON_WHITESPACE.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                break
+            read_more()
+        if buffer[pos:pos + 1] != '[':
+            raise ValueError("Expected a JSON array")
+        pos += 1
+        
+        while True:
+            pos = _JSON_SEPARATORS.match(buffer, pos).end()
+            if pos == len(buffer):
+                if eof:
+                    raise ValueError("Unterminated JSON array")
+                read_more()
+                continue
+            if buffer[pos] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                # The next item runs past the end of the buffer, read some more
+                read_more()
+                continue
+            if not eof and buffer[end:end + 1] not in _JSON_DELIMITERS:
+                # A number can decode from a prefix of itself ("12" of "12345",
+                # "1.5" of "1.5e3"), so only trust an item once a delimiter follows it
+                read_more()
+                continue
+            pos = end
+            yield item
+
+def read_checkpoint(file_path):
+    """Song results saved by an earlier, interrupted run, keyed by (artist, track)
 
-def process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_info_file, genius_token):
-    # Dictionary to store unique songs (using track+artist as key)
-    unique_songs = {}
+    A partly written last line is cut off so new results can be appended after it.
+    """
+    saved = {}
+    if not os.path.exists(file_path):
+        return saved
     
-    # Dictionary to store play counts and durations
-    play_stats = {}
+    with open(file_path, 'rb+') as file:
+        complete = 0
+        for line in file:
+            if not line.endswith(b'\n'):
+                break
+            try:
+                song_info = json.loads(line)
+            except ValueError:
+                break
+            saved[(song_info["artistName"], song_info["trackName"])] = song_info
+            complete += len(line)
+        file.truncate(complete)
+    return saved
+
+def iter_batches(items, size):
+    """Group an iterable into lists of at most size items"""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+def aggregate_plays(entries):
+    """Play count and total ms played per song, in order of first appearance"""
+    plays = pd.DataFrame(entries, columns=["artistName", "trackName", "msPlayed"])
+    
+    # Entries without msPlayed count as 0 ms
+    plays["msPlayed"] = plays["msPlayed"].fillna(0).astype("int64")
+    
+    return plays.groupby(["artistName", "trackName"], sort=False, dropna=False).agg(
+        playCount=("msPlayed", "size"),
+        totalMsPlayed=("msPlayed", "sum")
+    )
+
+def search_track(session, token, track_name, artist_name):
+    """Spotify ID of the best search match for a track, or None"""
+    try:
+        query = f"track:{track_name} artist:{artist_name}"
+        headers = {
+            'Authorization': f'Bearer {token}'
+        }
+        response = session.get(
+            f'https://api.spotify.com/v1/search?q={quote(query)}&type=track&limit=1',
+            headers=headers,
+            timeout=SPOTIFY_TIMEOUT
+        )
+        response.raise_for_status()  # Raise exception for HTTP errors
+        
+        data = response.json()
+        if data['tracks']['items']:
+            return data['tracks']['items'][0]['id']
+        else:
+            print(f"No track found for: {track_name} by {artist_name}")
+            return None
+    except Exception as error:
+        print(f'Error searching for track "{track_name}": {str(error)}')
+        return None
+
+def merge_plays(partials):
+    """Combine partial aggregates, keeping songs in order of first appearance"""
+    return pd.concat(partials).groupby(["artistName", "trackName"], sort=False, dropna=False).sum()
+
+def aggregate_file(file_path):
+    """Aggregate one history file and return it with its number of plays
+
+    The file is streamed in batches, so only one batch of entries is held in
+    memory at a time.
+    """
+    partials = []
+    plays = 0
+    for batch in iter_batches(iter_json_array(file_path), PLAY_BATCH_SIZE):
+        partials.append(aggregate_plays(batch))
+        plays += len(batch)
+    return (merge_plays(partials) if partials else None), plays
+
+def process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_info_file, genius_token, spotify_token=None):
+    partials = []
     total_plays = 0
     
-    # Process each input file
-    for file_path in input_files:
-        try:
-            with open(file_path, 'r', encoding='utf-8') as file:
-                data = json.load(file)
-                
-                # Process each song entry
-                for entry in data:
-                    # Create a unique key using artist and track name
-                    key = f"{entry['artistName']}|{entry['trackName']}"
-                    total_plays += 1
-                    
-                    # Store unique song if we haven't seen it before
-                    if key not in unique_songs:
-                        unique_songs[key] = {
-                            "artistName": entry["artistName"],
-                            "trackName": entry["trackName"]
-                        }
-                    
-                    # Update play statistics
-                    if key not in play_stats:
-                        play_stats[key] = {
-                            "artistName": entry["artistName"],
-                            "trackName": entry["trackName"],
-                            "playCount": 1,
-                            "totalMsPlayed": entry.get("msPlayed", 0)
-                        }
-                    else:
-                        play_stats[key]["playCount"] += 1
-                        play_stats[key]["totalMsPlayed"] += entry.get("msPlayed", 0)
-                        
-        except Exception as e:
-            print(f"Error processing file {file_path}: {e}")
-    
-    # Convert dictionary values to list for JSON output
-    unique_songs_list = list(unique_songs.values())
-    play_stats_list = list(play_stats.values())
+    # Files are independent, so parse them on separate cores. Each worker sends
+    # back only its per-song aggregate
+    workers = max(1, min(len(input_files), os.cpu_count() or 1))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = [executor.submit(aggregate_file, file_path) for file_path in input_files]
+        for file_path, future in zip(input_files, futures):
+            try:
+                file_stats, file_plays = future.result()
+            except Exception as e:
+                print(f"Error processing file {file_path}: {e}")
+                continue
+            if file_stats is not None:
+                partials.append(file_stats)
+            total_plays += file_plays
+    
+    # Merge the per-file aggregates
+    if partials:
+        song_stats = merge_plays(partials).reset_index()
+    else:
+        song_stats = pd.DataFrame(columns=["artistName", "trackName", "playCount", "totalMsPlayed"])
+    
+    # Convert to lists of dicts for JSON output
+    unique_songs_list = song_stats[["artistName", "trackName"]].to_dict("records")
+    play_stats_list = song_stats.to_dict("records")
     
     # Add total song count to play stats
     play_stats_summary = {
@@ -95,43 +349,61 @@ def process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_in
     }
     
     # Write unique songs to output file
-    with open(unique_songs_file, 'w', encoding='utf-8') as file:
-        json.dump(unique_songs_list, file, indent=2, ensure_ascii=False)
+    write_json(unique_songs_file, unique_songs_list)
     
     # Write play statistics to output file
-    with open(play_stats_file, 'w', encoding='utf-8') as file:
-        json.dump(play_stats_summary, file, indent=2, ensure_ascii=False)
+    write_json(play_stats_file, play_stats_summary)
     
     # Get lyrics info if token is provided
     if genius_token:
-        lyrics_finder = GeniusLyricsFinder(genius_token)
-        lyrics_info = []
-        print(f"Looking up lyrics information for {len(unique_songs_list)} songs...")
-        for i, song in enumerate(unique_songs_list):
-            artist = song["artistName"]
-            track = song["trackName"]
+        # Checkpoint each result as a JSON line instead of rewriting the whole list,
+        # and pick up where an interrupted run left off
+        checkpoint_file = lyrics_info_file + '.jsonl'
+        song_results = read_checkpoint(checkpoint_file)
+        pending = [song for song in unique_songs_list if (song["artistName"], song["trackName"]) not in song_results]
+        if song_results:
+            print(f"Resuming with {len(song_results)} songs saved in {checkpoint_file}")
+        print(f"Looking up lyrics information for {len(pending)} songs...")
+        
+        with shelve.open(GENIUS_CACHE_FILE) as genius_cache, open(checkpoint_file, 'ab') as checkpoint:
+            lyrics_finder = GeniusLyricsFinder(genius_token, cache=genius_cache)
+            spotify_session = requests.Session()
             
-            # Add basic song info
-            song_info = {
-                "artistName": artist,
-                "trackName": track
-            }
-
-
-            lyrics_info.append(song_info)
-            search_track(token, track, artist)
-            # Print progress
-            if (i + 1) % 10 == 0 or i == len(unique_songs_list) - 1:
-                print(f"Processed {i + 1}/{len(unique_songs_list)} songs")
-                with open(lyrics_info_file, 'w', encoding='utf-8') as file:
-                    json.dump(lyrics_info, file, indent=2, ensure_ascii=False)
+            def search(song):
+                lyrics = lyrics_finder.search_song(song["artistName"], song["trackName"])
+                # Also look up the Spotify track ID when a Spotify token is given
+                track_id = None
+                if spotify_token:
+                    track_id = search_track(spotify_session, spotify_token, song["trackName"], song["artistName"])
+                return lyrics, track_id
             
-            # Sleep to avoid rate limiting
-            time.sleep(1)
+            # The lookups are network bound, so keep a few requests in flight at once
+            with ThreadPoolExecutor(max_workers=GENIUS_WORKERS) as executor:
+                for i, (song, (lyrics, track_id)) in enumerate(zip(pending, executor.map(search, pending))):
+                    artist = song["artistName"]
+                    track = song["trackName"]
+                    
+                    # Add basic song info
+                    song_info = {
+                        "artistName": artist,
+                        "trackName": track
+                    }
+                    if track_id:
+                        song_info["trackId"] = track_id
+                    if lyrics:
+                        song_info.update(lyrics)
+                    
+                    song_results[(artist, track)] = song_info
+                    checkpoint.write(_json_line(song_info) + b'\n')
+                    # Print progress
+                    if (i + 1) % 10 == 0 or i == len(pending) - 1:
+                        print(f"Processed {i + 1}/{len(pending)} songs")
+                        checkpoint.flush()
         
-        # Write lyrics info to output file
-        with open(lyrics_info_file, 'w', encoding='utf-8') as file:
-            json.dump(lyrics_info, file, indent=2, ensure_ascii=False)
+        # Write lyrics info to output file in song order, the checkpoint is no longer needed
+        lyrics_info = [song_results[(song["artistName"], song["trackName"])] for song in unique_songs_list]
+        write_json(lyrics_info_file, lyrics_info)
+        os.remove(checkpoint_file)
         
         print(f"Lyrics information saved to {lyrics_info_file}")
     
@@ -139,49 +411,32 @@ def process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_in
     print(f"Recorded {total_plays} total plays.")
     print(f"Unique songs saved to {unique_songs_file}")
     print(f"Play statistics saved to {play_stats_file}")
-    # Function to search for a track
-    async def search_track(token, track_name, artist_name):
-        try:
-            query = f"track:{track_name} artist:{artist_name}"
-            headers = {
-                'Authorization': f'Bearer {token}'
-            }
-            response = requests.get(
-                f'https://api.spotify.com/v1/search?q={requests.utils.quote(query)}&type=track&limit=1',
-                headers=headers
-            )
-            response.raise_for_status()  # Raise exception for HTTP errors
-            
-            data = response.json()
-            if data['tracks']['items']:
-                return data['tracks']['items'][0]['id']
-            else:
-                print(f"No track found for: {track_name} by {artist_name}")
-                return None
-        except Exception as error:
-            print(f'Error searching for track "{track_name}": {str(error)}')
-            return None
+
 # Main execution
 if __name__ == "__main__":
-    # Get all JSON files in current directory
-    input_files = glob.glob("*.json")
-    
-    # Remove the output files from input list if they exist
     unique_songs_file = "unique_songs.json"
     play_stats_file = "play_statistics.json"
     lyrics_info_file = "lyrics_info.json"
     
-    output_files = [unique_songs_file, play_stats_file, lyrics_info_file]
-    for output_file in output_files:
-        if output_file in input_files:
-            input_files.remove(output_file)
+    # Get all JSON files in current directory, except the output files
+    output_files = {unique_songs_file, play_stats_file, lyrics_info_file}
+    with os.scandir('.') as entries:
+        input_files = sorted(
+            entry.name for entry in entries
+            if entry.name.endswith('.json') and entry.name not in output_files and entry.is_file()
+        )
     
     # You need to register for a Genius API client access token
-    # Get it from https://genius.com/api-clients
-    genius_token = "XtxjNV501TUgVdb2f1LIjT4EiaAzjNRaey0iIcS0cVEFRYj5uud49RnleBHAe-1S"
+    # Get it from https://genius.com/api-clients and set it as GENIUS_TOKEN
+    genius_token = os.environ.get("GENIUS_TOKEN")
+    if not genius_token:
+        print("Skipping lyrics lookup; set GENIUS_TOKEN to enable it")
+    
+    # Optional Spotify API token, used to add track IDs to the lyrics info
+    spotify_token = os.environ.get("SPOTIFY_TOKEN")
     
     if not input_files:
         print("No JSON files found in current directory!")
     else:
         print(f"Processing {len(input_files)} JSON files...")
-        process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_info_file, genius_token)
\ No newline at end of file
+        process_song_data(input_files, unique_songs_file, play_stats_file, lyrics_info_file, genius_token, spotify_token)
\ No newline at end of file
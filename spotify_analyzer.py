@@ -1,80 +1,321 @@
 # spotify_analyzer.py
 import os
 import json
+import hashlib
 import pandas as pd
 import matplotlib.pyplot as plt
 import seaborn as sns
 from datetime import datetime
 import numpy as np
 from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    def _json_loads(buffer):
+        # json.loads can't take a memoryview
+        return json.loads(buffer if isinstance(buffer, (bytes, str)) else bytes(buffer))
+
+# Fields of a streaming record the analysis actually uses. trackId is only
+# present in some exports and is needed for the Spotify API enrichment
+RECORD_COLUMNS = ['endTime', 'artistName', 'trackName', 'msPlayed']
+OPTIONAL_RECORD_COLUMNS = ['trackId']
+
+# Timestamp format of endTime in the streaming history exports
+END_TIME_FORMAT = '%Y-%m-%d %H:%M'
+
+# When caching is turned on, cleaned DataFrames of earlier runs, keyed by the
+# input files, are kept in this directory next to the data files
+CACHE_DIR = ".spotify_cache"
+
+# Part of every cache key. Bump it whenever _build_dataframe changes the columns
+# or dtypes it produces, so frames cached by older code are not loaded
+CACHE_SCHEMA_VERSION = 1
+
+# Upper bound on the threads reading history files at once
+LOAD_WORKERS = 8
+
+# Names for the integer month and weekday columns, looked up on the small
+# aggregates instead of formatting every timestamp
+MONTH_NAMES = np.array(['January', 'February', 'March', 'April', 'May', 'June',
+                        'July', 'August', 'September', 'October', 'November', 'December'], dtype=object)
+DAY_NAMES = np.array(['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday'], dtype=object)
+
+
+def _read_json_file(file_path):
+    """Read and parse a single streaming history file"""
+    # Parse the raw bytes, orjson is a lot faster than json.load here
+    with open(file_path, 'rb') as f:
+        return _json_loads(f.read())
+
+
+def _records_frame(records):
+    """Pull the fields the analysis uses out of parsed streaming records"""
+    if isinstance(records, dict):
+        records = [records]
+    columns = RECORD_COLUMNS + [column for column in OPTIONAL_RECORD_COLUMNS if records and column in records[0]]
+    return pd.DataFrame.from_records(records, columns=columns)
+
+
+def _read_records_frame(file_path):
+    """Read a streaming history file straight into a frame of the used fields"""
+    # The parsed record dicts only live until the frame is built
+    return _records_frame(_read_json_file(file_path))
+
+
+def _grouped_sum(codes, size, weights=None):
+    """Sum (or count) values per factorized code, skipping missing values (code -1)"""
+    valid = codes >= 0
+    if not valid.all():
+        codes = codes[valid]
+        weights = weights[valid] if weights is not None else None
+    return np.bincount(codes, weights=weights, minlength=size)
+
+
+def _top_series(values, index, limit, name=None):
+    """The limit largest values as a Series, like a stable descending sort followed by head(limit)"""
+    if 0 < limit < len(values):
+        # Only values tied with or above the limit-th largest can make the cut,
+        # so just those few get sorted
+        kth = np.partition(values, len(values) - limit)[len(values) - limit]
+        candidates = np.flatnonzero(values >= kth)
+    else:
+        candidates = np.arange(len(values))
+    # A stable sort keeps the order of tied entries deterministic
+    top = candidates[np.argsort(-values[candidates], kind='stable')[:limit]]
+    return pd.Series(values[top], index=index[top], name=name)
+
+
+def _factorize(values):
+    """pd.factorize that reuses the integer codes of categorical columns
+
+    Codes follow the order groupby sorts its keys in (category order, or sorted
+    labels), so stable rankings break ties the same way groupby results do.
+    """
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.cat.remove_unused_categories()
+        return values.cat.codes.to_numpy(), values.cat.categories
+    return pd.factorize(values, sort=True)
+
+
+def _write_lines(path, lines):
+    """Write a text report in one go, one entry per line"""
+    with open(path, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+
+def _save_figure(fig, path):
+    """Write a report figure as PNG and free it"""
+    # Fast zlib compression, the report PNGs are mostly flat color anyway
+    fig.savefig(path, pil_kwargs={'compress_level': 1})
+    plt.close(fig)
+
+
+def _files_digest(file_paths):
+    """Digest of the cache schema version and the files' paths, sizes and modification times, None if one is missing"""
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(f"schema {CACHE_SCHEMA_VERSION}\n".encode())
+    for file_path in file_paths:
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return None
+        digest.update(f"{os.path.abspath(file_path)}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode())
+    return digest.hexdigest()
+
+
+def _prefetch_files(file_paths):
+    """Ask the kernel to start reading all the files in one go (Linux only)"""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    for file_path in file_paths:
+        try:
+            fd = os.open(file_path, os.O_RDONLY)
+        except OSError:
+            continue  # reported when the file is actually read
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+
 
 class SpotifyAnalyzer:
-    def __init__(self, data_files):
+    def __init__(self, data_files, cache_dir=None):
         """
         Initialize the Spotify data analyzer.
         
         Parameters:
         data_files (str or list): Path to the JSON file(s) containing Spotify data
+        cache_dir (str): Directory for a Parquet cache of the cleaned data, off by default
         """
         self.data_files = data_files if isinstance(data_files, list) else [data_files]
+        self.cache_dir = cache_dir
         self.df = None
         self.load_data()
         
+    @classmethod
+    def from_records(cls, records):
+        """
+        Create an analyzer from already parsed streaming records.
+        
+        Parameters:
+        records (list): Streaming history entries as dicts
+        """
+        analyzer = cls.__new__(cls)
+        analyzer.data_files = []
+        analyzer.df = None
+        analyzer._build_dataframe(_records_frame(list(records)))
+        return analyzer
+        
+    @classmethod
+    def from_buffers(cls, buffers):
+        """
+        Create an analyzer from the raw contents of JSON history files.
+        
+        Parameters:
+        buffers (list): bytes or memoryview objects, e.g. from uploaded files
+        """
+        frames = []
+        
+        for i, buffer in enumerate(buffers):
+            try:
+                file_data = _json_loads(buffer)
+            except Exception as e:
+                print(f"Error loading buffer {i}: {e}")
+                continue
+            # Keep only the used columns of each upload, so the parsed record
+            # dicts of at most one (possibly huge) upload are alive at a time
+            frames.append(_records_frame(file_data))
+            del file_data
+        
+        analyzer = cls.__new__(cls)
+        analyzer.data_files = []
+        analyzer.df = None
+        analyzer._build_dataframe(pd.concat(frames, ignore_index=True) if frames else None)
+        return analyzer
+        
     def load_data(self):
-        """Load Spotify streaming data from JSON files"""
-        data = []
+        """Load Spotify streaming data from JSON files, or from the cache of an earlier run"""
+        cache_path = self._cache_path()
+        if cache_path is not None and os.path.exists(cache_path):
+            try:
+                self.df = pd.read_parquet(cache_path)
+                print(f"Loaded {len(self.df)} cleaned plays from cache")
+                return self.df
+            except Exception as e:
+                print(f"Ignoring unreadable cache {cache_path}: {e}")
         
-        for file_path in self.data_files:
+        self._parse_files()
+        if cache_path is not None:
+            self._write_cache(cache_path)
+        return self.df
+    
+    def _cache_path(self):
+        """Parquet cache file for the current input files, None when caching is off"""
+        if getattr(self, 'cache_dir', None) is None:
+            return None
+        digest = _files_digest(self.data_files)
+        return os.path.join(self.cache_dir, f"{digest}.parquet") if digest else None
+    
+    def _write_cache(self, cache_path):
+        """Save the cleaned DataFrame, writing to a temporary file first so readers never see a partial one"""
+        tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self.df.to_parquet(tmp_path, compression='zstd')
+            os.replace(tmp_path, cache_path)
+        except (ImportError, OSError, ValueError) as e:
+            # Caching is only an optimization, e.g. pyarrow may not be installed
+            print(f"Could not cache the loaded data: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    def _parse_files(self):
+        """Parse the JSON files and build the analysis DataFrame"""
+        frames = []
+        
+        # The files are independent, so read and parse them concurrently. Each
+        # one becomes its own frame instead of growing one big list of dicts
+        if len(self.data_files) > 1:
+            _prefetch_files(self.data_files)
+        with ThreadPoolExecutor(max_workers=max(1, min(LOAD_WORKERS, len(self.data_files)))) as executor:
+            futures = [executor.submit(_read_records_frame, file_path) for file_path in self.data_files]
+        
+        for file_path, future in zip(self.data_files, futures):
             try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    file_data = json.load(f)
-                    if isinstance(file_data, list):
-                        data.extend(file_data)
-                    else:
-                        data.append(file_data)
+                frames.append(future.result())
             except Exception as e:
                 print(f"Error loading {file_path}: {e}")
         
-        if not data:
+        return self._build_dataframe(pd.concat(frames, ignore_index=True) if frames else None)
+        
+    def _build_dataframe(self, records_df):
+        """Build the analysis DataFrame from the raw record fields"""
+        if records_df is None or records_df.empty:
             raise ValueError("No data could be loaded from the provided files")
             
-        print(f"Loaded {len(data)} streaming records")
+        print(f"Loaded {len(records_df)} streaming records")
+        # Drop our own reference so the unfiltered frame is freed once the
+        # short plays are filtered out below
+        self.df = records_df
+        del records_df
+        
+        # Filter out very short plays (likely skips) first, so none of the
+        # datetime work below is spent on rows that are thrown away
+        self.df = self.df[self.df['msPlayed'] > 30000]
         
-        # Convert to DataFrame
-        self.df = pd.DataFrame(data)
+        # Play durations easily fit in int32, which halves the memory traffic of every sum
+        self.df['msPlayed'] = self.df['msPlayed'].astype(np.int32)
         
-        # Convert endTime to datetime
-        self.df['endTime'] = pd.to_datetime(self.df['endTime'])
+        # Convert endTime to datetime, with the export's fixed format so pandas skips inference
+        try:
+            self.df['endTime'] = pd.to_datetime(self.df['endTime'], format=END_TIME_FORMAT)
+        except ValueError:
+            self.df['endTime'] = pd.to_datetime(self.df['endTime'])
         
-        # Extract date components
-        self.df['date'] = self.df['endTime'].dt.date
-        self.df['year'] = self.df['endTime'].dt.year
-        self.df['month'] = self.df['endTime'].dt.month
-        self.df['month_name'] = self.df['endTime'].dt.strftime('%B')
-        self.df['day'] = self.df['endTime'].dt.day
-        self.df['weekday'] = self.df['endTime'].dt.dayofweek
-        self.df['weekday_name'] = self.df['endTime'].dt.strftime('%A')
-        self.df['hour'] = self.df['endTime'].dt.hour
+        # Extract date components, in the smallest integer types that hold
+        # them so every scan over these columns moves fewer bytes
+        self.df['year'] = self.df['endTime'].dt.year.astype(np.int16)
+        self.df['month'] = self.df['endTime'].dt.month.astype(np.int8)
+        self.df['weekday'] = self.df['endTime'].dt.dayofweek.astype(np.int8)
+        self.df['hour'] = self.df['endTime'].dt.hour.astype(np.int8)
         
-        # Convert ms to more readable units
+        # Minutes per play, used throughout the session and context analyses.
+        # Hour totals are summed from msPlayed instead of keeping another column
         self.df['minutes_played'] = self.df['msPlayed'] / 60000
-        self.df['hours_played'] = self.df['msPlayed'] / 3600000
         
-        # Filter out very short plays (likely skips)
-        self.df = self.df[self.df['msPlayed'] > 30000]
+        # Exports are usually sorted already, but the streak and session logic relies on it
+        if not self.df['endTime'].is_monotonic_increasing:
+            self.df = self.df.sort_values('endTime', kind='mergesort')
+        
+        # Names repeat thousands of times, store them as categoricals
+        self.df['artistName'] = self.df['artistName'].astype('category')
+        self.df['trackName'] = self.df['trackName'].astype('category')
         
         return self.df
         
     def basic_stats(self):
         """Get basic stats about your listening habits"""
+        return self._basic_stats
+    
+    @cached_property
+    def _basic_stats(self):
+        """Overall totals and date range, computed on first use"""
         total_songs = len(self.df)
-        unique_tracks = self.df['trackName'].nunique()
-        unique_artists = self.df['artistName'].nunique()
+        # The factorized labels are exactly the distinct names
+        unique_tracks = len(self._track_name_factors[1])
+        unique_artists = len(self._artist_factors[1])
         
-        total_ms = self.df['msPlayed'].sum()
+        total_ms = int(self._ms.sum(dtype=np.int64))
         total_hours = total_ms / 3600000
         
-        date_range = (self.df['endTime'].max() - self.df['endTime'].min()).days
+        # _build_dataframe leaves the plays sorted by endTime
+        times = self.df['endTime'].to_numpy()
+        first_play, last_play = pd.Timestamp(times[0]), pd.Timestamp(times[-1])
+        date_range = (last_play - first_play).days
         avg_daily_listening = total_hours / date_range if date_range > 0 else 0
         
         return {
@@ -84,49 +325,121 @@ class SpotifyAnalyzer:
             "total_listening_hours": total_hours,
             "date_range_days": date_range,
             "avg_daily_hours": avg_daily_listening,
-            "start_date": self.df['endTime'].min().date(),
-            "end_date": self.df['endTime'].max().date()
+            "start_date": first_play.date(),
+            "end_date": last_play.date()
         }
     
+    @cached_property
+    def _ms(self):
+        """msPlayed as a plain NumPy array for the bincount aggregations"""
+        return self.df['msPlayed'].to_numpy()
+    
+    @cached_property
+    def _artist_factors(self):
+        """Integer artist codes and their labels, built once with pd.factorize"""
+        codes, labels = _factorize(self.df['artistName'])
+        return codes, pd.Index(labels, name='artistName')
+    
+    @cached_property
+    def _artist_totals(self):
+        """Play count and hours per artist, computed once and ranked by top_artists"""
+        codes, labels = self._artist_factors
+        counts = _grouped_sum(codes, len(labels))
+        hours = _grouped_sum(codes, len(labels), weights=self._ms) / 3600000
+        return counts, hours
+    
+    @cached_property
+    def _track_name_factors(self):
+        """Integer track name codes and their labels"""
+        codes, labels = _factorize(self.df['trackName'])
+        return codes, pd.Index(labels, name='trackName')
+    
+    @cached_property
+    def _track_factors(self):
+        """Integer codes for (track, artist) pairs and their labels"""
+        track_codes, track_labels = self._track_name_factors
+        artist_codes, artist_labels = self._artist_factors
+        
+        # Combine both codes into one integer key instead of hashing tuples
+        keys = track_codes.astype(np.int64) * len(artist_labels) + artist_codes
+        missing = (track_codes < 0) | (artist_codes < 0)
+        # Sorted, so pairs are numbered in (track, artist) order like groupby keys
+        codes, uniques = pd.factorize(pd.arrays.IntegerArray(keys, missing), sort=True)
+        uniques = uniques.to_numpy(dtype=np.int64)
+        
+        labels = pd.MultiIndex(
+            levels=[track_labels, artist_labels],
+            codes=[uniques // len(artist_labels), uniques % len(artist_labels)],
+            names=['trackName', 'artistName']
+        )
+        return codes, labels
+    
+    @cached_property
+    def _track_totals(self):
+        """Play count and hours per (track, artist), computed once and ranked by top_tracks"""
+        codes, labels = self._track_factors
+        counts = _grouped_sum(codes, len(labels))
+        hours = _grouped_sum(codes, len(labels), weights=self._ms) / 3600000
+        return counts, hours
+    
     def top_artists(self, limit=10):
         """Get your most listened to artists"""
-        # By play count
-        top_by_count = self.df['artistName'].value_counts().nlargest(limit)
-        
-        # By time listened
-        artist_time = self.df.groupby('artistName')['hours_played'].sum().nlargest(limit)
+        counts, hours = self._artist_totals
+        labels = self._artist_factors[1]
         
         return {
-            "by_count": top_by_count,
-            "by_time": artist_time
+            "by_count": _top_series(counts, labels, limit, name='count'),
+            "by_time": _top_series(hours, labels, limit, name='hours_played')
         }
     
     def top_tracks(self, limit=10):
         """Get your most listened to tracks"""
-        # By play count
-        top_by_count = self.df.groupby(['trackName', 'artistName']).size().nlargest(limit)
-        
-        # By time listened
-        track_time = self.df.groupby(['trackName', 'artistName'])['hours_played'].sum().nlargest(limit)
+        counts, hours = self._track_totals
+        labels = self._track_factors[1]
         
         return {
-            "by_count": top_by_count,
-            "by_time": track_time
+            "by_count": _top_series(counts, labels, limit),
+            "by_time": _top_series(hours, labels, limit, name='hours_played')
         }
     
+    @cached_property
+    def _month_factors(self):
+        """Integer code per play for its (year, month), shared by every monthly aggregate"""
+        years = self.df['year'].to_numpy()
+        months = self.df['month'].to_numpy()
+        month_keys, month_codes = np.unique(years.astype(np.int64) * 12 + months - 1, return_inverse=True)
+        month_index = pd.MultiIndex.from_arrays(
+            [(month_keys // 12).astype(years.dtype), (month_keys % 12 + 1).astype(months.dtype)],
+            names=['year', 'month']
+        )
+        return month_codes, month_index
+    
     def listening_by_time(self):
         """Analyze listening patterns by time (hour, day, month)"""
-        # By hour
-        hourly = self.df.groupby('hour')['minutes_played'].sum()
-        
-        # By day of week
-        daily = self.df.groupby('weekday_name')['minutes_played'].sum()
-        # Ensure correct day order
-        day_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        daily = daily.reindex(day_order)
+        return self._time_patterns
+    
+    @cached_property
+    def _time_patterns(self):
+        """Hourly, daily and monthly totals, computed on first use"""
+        # By hour, only keeping hours that actually have plays
+        hours = self.df['hour'].to_numpy()
+        hourly_minutes = _grouped_sum(hours, 24, weights=self._ms) / 60000
+        played_hours = np.flatnonzero(_grouped_sum(hours, 24))
+        hourly = pd.Series(hourly_minutes[played_hours], index=pd.Index(played_hours, name='hour'),
+                           name='minutes_played')
+        
+        # By day of week, in Monday to Sunday order
+        weekdays = self.df['weekday'].to_numpy()
+        daily_minutes = _grouped_sum(weekdays, 7, weights=self._ms) / 60000
+        daily_minutes[_grouped_sum(weekdays, 7) == 0] = np.nan
+        daily = pd.Series(daily_minutes, index=pd.Index(DAY_NAMES, name='weekday_name'),
+                          name='minutes_played')
         
         # By month
-        monthly = self.df.groupby(['year', 'month', 'month_name'])['hours_played'].sum().reset_index()
+        month_codes, month_index = self._month_factors
+        monthly = month_index.to_frame(index=False)
+        monthly['month_name'] = MONTH_NAMES[monthly['month'].to_numpy() - 1]
+        monthly['hours_played'] = np.bincount(month_codes, weights=self._ms, minlength=len(month_index)) / 3600000
         
         return {
             "hourly": hourly,
@@ -136,19 +449,39 @@ class SpotifyAnalyzer:
     
     def artist_diversity(self):
         """Analyze artist diversity over time"""
-        monthly_unique = self.df.groupby(['year', 'month'])['artistName'].nunique()
-        
-        # Calculate repeats vs. new discoveries
-        artist_first_listen = self.df.groupby('artistName')['endTime'].min()
-        self.df['is_first_listen'] = self.df.apply(
-            lambda row: artist_first_listen[row['artistName']] == row['endTime'], 
-            axis=1
-        )
+        return self._diversity
+    
+    @cached_property
+    def _diversity(self):
+        """Monthly artist diversity, computed on first use"""
+        codes, labels = self._artist_factors
+        times = self.df['endTime'].to_numpy()
+        
+        month_codes, month_index = self._month_factors
+        n_months = len(month_index)
+        
+        # Distinct artists per month are the distinct (month, artist) pairs
+        valid = codes >= 0
+        pairs = np.unique(month_codes[valid] * len(labels) + codes[valid])
+        monthly_unique = pd.Series(np.bincount(pairs // len(labels), minlength=n_months),
+                                   index=month_index, name='artistName')
+        
+        # Calculate repeats vs. new discoveries: each artist's first listen is
+        # its earliest play, only one even if several share that endTime
+        if self.df['endTime'].is_monotonic_increasing:
+            order = np.flatnonzero(valid)
+        else:
+            order = np.argsort(times, kind='stable')
+            order = order[valid[order]]
+        _, first_positions = np.unique(codes[order], return_index=True)
+        is_first_listen = np.zeros(len(codes), dtype=bool)
+        is_first_listen[order[first_positions]] = True
+        self.df['is_first_listen'] = is_first_listen
         
         # Monthly ratio of new artists
-        monthly_listens = self.df.groupby(['year', 'month']).size()
-        monthly_new = self.df[self.df['is_first_listen']].groupby(['year', 'month']).size()
-        monthly_ratio = (monthly_new / monthly_listens).fillna(0)
+        monthly_listens = np.bincount(month_codes, minlength=n_months)
+        monthly_new = np.bincount(month_codes[is_first_listen], minlength=n_months)
+        monthly_ratio = pd.Series(monthly_new / monthly_listens, index=month_index)
         
         return {
             "monthly_unique": monthly_unique,
@@ -157,32 +490,39 @@ class SpotifyAnalyzer:
     
     def listening_streaks(self):
         """Analyze daily listening streaks"""
-        # Get sorted list of days with listening activity
-        active_days = sorted(self.df['date'].unique())
+        return self._streaks
+    
+    @cached_property
+    def _streaks(self):
+        """Daily listening streaks, computed on first use"""
+        # Get sorted list of days with listening activity. When endTime is
+        # sorted the unique days fall out of one comparison with the previous row
+        days = self.df['endTime'].to_numpy().astype('datetime64[D]')
+        if self.df['endTime'].is_monotonic_increasing:
+            active_days = days[np.r_[True, days[1:] != days[:-1]]] if len(days) else days
+        else:
+            active_days = np.unique(days)
         
         if len(active_days) == 0:
             return {"longest_streak": 0}
         
-        # Find the longest streak
-        longest_streak = current_streak = 1
-        longest_end = active_days[0]
-        
-        for i in range(1, len(active_days)):
-            # If consecutive day
-            if (active_days[i] - active_days[i-1]).days == 1:
-                current_streak += 1
-                if current_streak > longest_streak:
-                    longest_streak = current_streak
-                    longest_end = active_days[i]
-            else:
-                current_streak = 1
+        # Find the longest streak: a new run of days starts wherever the gap to
+        # the previous active day isn't exactly one day
+        day_numbers = active_days.astype(np.int64)
+        run_starts = np.flatnonzero(np.r_[True, np.diff(day_numbers) != 1])
+        run_lengths = np.diff(np.r_[run_starts, len(day_numbers)])
+        longest_run = run_lengths.argmax()  # the earliest of equally long streaks
+        longest_streak = int(run_lengths[longest_run])
+        longest_end_idx = run_starts[longest_run] + longest_streak - 1
         
+        longest_end = active_days[longest_end_idx].item()
         longest_start = longest_end - pd.Timedelta(days=longest_streak-1)
+        total_days = int(day_numbers[-1] - day_numbers[0]) + 1
         
         return {
             "days_with_activity": len(active_days),
-            "total_days_range": (active_days[-1] - active_days[0]).days + 1,
-            "activity_ratio": len(active_days) / ((active_days[-1] - active_days[0]).days + 1),
+            "total_days_range": total_days,
+            "activity_ratio": len(active_days) / total_days,
             "longest_streak": longest_streak,
             "longest_streak_start": longest_start,
             "longest_streak_end": longest_end
@@ -190,21 +530,29 @@ class SpotifyAnalyzer:
     
     def listening_heatmap_data(self):
         """Get data for hour × day listening heatmap"""
-        # Create a pivot table of weekday x hour
-        heatmap_data = self.df.pivot_table(
-            values='minutes_played',
-            index='weekday',
-            columns='hour',
-            aggfunc='sum',
-            fill_value=0
-        )
+        return self._heatmap
+    
+    @cached_property
+    def _heatmap(self):
+        """Weekday × hour listening minutes, computed on first use"""
+        # Sum straight into the 7 x 24 grid, one cell code per weekday and hour
+        hours = self.df['hour']
+        cells = self.df['weekday'].to_numpy().astype(np.int64) * 24 + hours.to_numpy()
+        minutes = (_grouped_sum(cells, 7 * 24, weights=self._ms) / 60000).reshape(7, 24)
+        plays = _grouped_sum(cells, 7 * 24).reshape(7, 24)
+        
+        # Like a pivot table, only keep the days and hours that have plays
+        played_days = np.flatnonzero(plays.any(axis=1))
+        played_hours = np.flatnonzero(plays.any(axis=0))
         
         # Map day numbers to names and ensure correct order
         day_mapping = {0: 'Monday', 1: 'Tuesday', 2: 'Wednesday', 
                      3: 'Thursday', 4: 'Friday', 5: 'Saturday', 6: 'Sunday'}
-        heatmap_data.index = [day_mapping[day] for day in heatmap_data.index]
-        
-        return heatmap_data
+        return pd.DataFrame(
+            minutes[np.ix_(played_days, played_hours)],
+            index=[day_mapping[day] for day in played_days],
+            columns=pd.Index(played_hours.astype(hours.dtype), name='hour')
+        )
     
     def mood_analysis(self, acoustic_energy_ratio=0.5):
         """
@@ -382,61 +730,71 @@ class SpotifyAnalyzer:
         
         # Basic stats
         stats = self.basic_stats()
-        with open(f"{output_dir}/basic_stats.txt", "w") as f:
-            f.write("=== SPOTIFY LISTENING ANALYSIS ===\n\n")
-            f.write(f"Period: {stats['start_date']} to {stats['end_date']} ({stats['date_range_days']} days)\n")
-            f.write(f"Total tracks played: {stats['total_songs_played']}\n")
-            f.write(f"Unique tracks: {stats['unique_tracks']}\n")
-            f.write(f"Unique artists: {stats['unique_artists']}\n")
-            f.write(f"Total listening time: {stats['total_listening_hours']:.2f} hours\n")
-            f.write(f"Average daily listening: {stats['avg_daily_hours']:.2f} hours\n\n")
+        lines = [
+            "=== SPOTIFY LISTENING ANALYSIS ===\n",
+            f"Period: {stats['start_date']} to {stats['end_date']} ({stats['date_range_days']} days)",
+            f"Total tracks played: {stats['total_songs_played']}",
+            f"Unique tracks: {stats['unique_tracks']}",
+            f"Unique artists: {stats['unique_artists']}",
+            f"Total listening time: {stats['total_listening_hours']:.2f} hours",
+            f"Average daily listening: {stats['avg_daily_hours']:.2f} hours\n",
+        ]
+        _write_lines(f"{output_dir}/basic_stats.txt", lines)
         
         # Top artists and tracks
         top_artists = self.top_artists()
         top_tracks = self.top_tracks()
         
-        with open(f"{output_dir}/top_artists_tracks.txt", "w") as f:
-            f.write("=== TOP ARTISTS ===\n\n")
-            f.write("By Play Count:\n")
-            for i, (artist, count) in enumerate(top_artists["by_count"].items(), 1):
-                f.write(f"{i}. {artist}: {count} plays\n")
-            
-            f.write("\nBy Time Listened:\n")
-            for i, (artist, hours) in enumerate(top_artists["by_time"].items(), 1):
-                f.write(f"{i}. {artist}: {hours:.2f} hours\n")
-            
-            f.write("\n\n=== TOP TRACKS ===\n\n")
-            f.write("By Play Count:\n")
-            for i, ((track, artist), count) in enumerate(top_tracks["by_count"].items(), 1):
-                f.write(f"{i}. {track} - {artist}: {count} plays\n")
-            
-            f.write("\nBy Time Listened:\n")
-            for i, ((track, artist), hours) in enumerate(top_tracks["by_time"].items(), 1):
-                f.write(f"{i}. {track} - {artist}: {hours:.2f} hours\n")
+        lines = ["=== TOP ARTISTS ===\n", "By Play Count:"]
+        lines += [
+            f"{i}. {artist}: {count} plays"
+            for i, (artist, count) in enumerate(top_artists["by_count"].items(), 1)
+        ]
+        
+        lines.append("\nBy Time Listened:")
+        lines += [
+            f"{i}. {artist}: {hours:.2f} hours"
+            for i, (artist, hours) in enumerate(top_artists["by_time"].items(), 1)
+        ]
+        
+        lines += ["\n\n=== TOP TRACKS ===\n", "By Play Count:"]
+        lines += [
+            f"{i}. {track} - {artist}: {count} plays"
+            for i, ((track, artist), count) in enumerate(top_tracks["by_count"].items(), 1)
+        ]
+        
+        lines.append("\nBy Time Listened:")
+        lines += [
+            f"{i}. {track} - {artist}: {hours:.2f} hours"
+            for i, ((track, artist), hours) in enumerate(top_tracks["by_time"].items(), 1)
+        ]
+        _write_lines(f"{output_dir}/top_artists_tracks.txt", lines)
         
         # Streaks
         streak_info = self.listening_streaks()
-        with open(f"{output_dir}/listening_streaks.txt", "w") as f:
-            f.write("=== LISTENING STREAKS ===\n\n")
-            f.write(f"Days with activity: {streak_info['days_with_activity']} out of {streak_info['total_days_range']} days\n")
-            f.write(f"Activity ratio: {streak_info['activity_ratio']:.2%}\n")
-            f.write(f"Longest streak: {streak_info['longest_streak']} consecutive days\n")
-            f.write(f"Longest streak period: {streak_info['longest_streak_start']} to {streak_info['longest_streak_end']}\n")
+        lines = [
+            "=== LISTENING STREAKS ===\n",
+            f"Days with activity: {streak_info['days_with_activity']} out of {streak_info['total_days_range']} days",
+            f"Activity ratio: {streak_info['activity_ratio']:.2%}",
+            f"Longest streak: {streak_info['longest_streak']} consecutive days",
+            f"Longest streak period: {streak_info['longest_streak_start']} to {streak_info['longest_streak_end']}",
+        ]
+        _write_lines(f"{output_dir}/listening_streaks.txt", lines)
         
         # Save plots
-        self.plot_top_artists().savefig(f"{output_dir}/top_artists.png")
+        _save_figure(self.plot_top_artists(), f"{output_dir}/top_artists.png")
         
         track_fig1, track_fig2 = self.plot_top_tracks()
-        track_fig1.savefig(f"{output_dir}/top_tracks_by_count.png")
-        track_fig2.savefig(f"{output_dir}/top_tracks_by_time.png")
+        _save_figure(track_fig1, f"{output_dir}/top_tracks_by_count.png")
+        _save_figure(track_fig2, f"{output_dir}/top_tracks_by_time.png")
         
         hour_fig, day_fig, month_fig = self.plot_listening_patterns()
-        hour_fig.savefig(f"{output_dir}/listening_by_hour.png")
-        day_fig.savefig(f"{output_dir}/listening_by_day.png")
-        month_fig.savefig(f"{output_dir}/listening_by_month.png")
+        _save_figure(hour_fig, f"{output_dir}/listening_by_hour.png")
+        _save_figure(day_fig, f"{output_dir}/listening_by_day.png")
+        _save_figure(month_fig, f"{output_dir}/listening_by_month.png")
         
-        self.plot_listening_heatmap().savefig(f"{output_dir}/listening_heatmap.png")
-        self.plot_artist_diversity().savefig(f"{output_dir}/artist_diversity.png")
+        _save_figure(self.plot_listening_heatmap(), f"{output_dir}/listening_heatmap.png")
+        _save_figure(self.plot_artist_diversity(), f"{output_dir}/artist_diversity.png")
         
         print(f"Analysis complete! Results saved to '{output_dir}' directory.")
 
@@ -449,6 +807,9 @@ if __name__ == "__main__":
         print("Usage: python spotify_analyzer.py <path_to_json_file(s)>")
         sys.exit(1)
     
+    # Only writing files, no need for an interactive backend
+    plt.switch_backend('Agg')
+    
     json_files = sys.argv[1:]
     analyzer = SpotifyAnalyzer(json_files)
     analyzer.generate_report()
\ No newline at end of file
@@ -6,22 +6,99 @@ This module extends the SpotifyAnalyzer class with new analytical capabilities.
 
 import pandas as pd
 import numpy as np
-from collections import Counter
+import threading
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
+from spotify_analyzer import DAY_NAMES, MONTH_NAMES, _grouped_sum, _top_series
+
+# Maximum number of Spotify API batch requests in flight at once
+API_WORKERS = 4
+
+# Spotify's rolling rate limit: at most API_RATE_LIMIT calls in any API_RATE_WINDOW seconds
+API_RATE_LIMIT = 180
+API_RATE_WINDOW = 60
+
+# Audio feature columns added by enrich_with_audio_features
+AUDIO_FEATURE_COLUMNS = ['danceability', 'energy', 'key', 'loudness', 'mode',
+                         'speechiness', 'acousticness', 'instrumentalness',
+                         'liveness', 'valence', 'tempo']
+
+# Columns kept on the exploded one-row-per-genre frame used by the genre analyses
+GENRE_LONG_COLUMNS = ['endTime', 'year', 'month', 'msPlayed', 'genres']
+
+# Moods assigned by classify_moods, stored as a categorical column
+MOOD_CATEGORIES = ["Angry", "Happy", "Relaxed", "Sad"]
+
+# Contexts assigned by categorize_listening_contexts in rule order, stored as a categorical column
+CONTEXT_CATEGORIES = ["workout", "commute", "work", "party", "relaxation", "other"]
+
+# Session length histogram edges in minutes and their labels, shortest first
+SESSION_LENGTH_EDGES = (0, 15, 30, 60, 120, 240, float('inf'))
+SESSION_LENGTH_BINS = tuple(
+    f"{low}-{high}min" if high < float('inf') else f"{low}min+"
+    for low, high in zip(SESSION_LENGTH_EDGES[:-1], SESSION_LENGTH_EDGES[1:])
+)
+
+class _RateLimiter:
+    """Make callers wait so that no more than `limit` calls start within any `window` seconds."""
+    
+    def __init__(self, limit, window):
+        self.window = window
+        self._starts = deque(maxlen=limit)
+        self._lock = threading.Lock()
+    
+    def wait(self):
+        with self._lock:
+            if len(self._starts) == self._starts.maxlen:
+                delay = self._starts[0] + self.window - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            self._starts.append(time.monotonic())
+
+# Shared by every analyzer, since the limit applies to the whole app
+_API_RATE_LIMITER = _RateLimiter(API_RATE_LIMIT, API_RATE_WINDOW)
+
+def _category_matrix(rows, size, column, weights=None):
+    """
+    Sum weights (or count plays) per small-int row value and category of a categorical column.
+    
+    Equivalent to groupby([rows, column], observed=True).sum().unstack(fill_value=0), from one
+    bincount over combined codes. Rows and categories that never occur are left out.
+    """
+    categories = column.cat.categories
+    category_codes = column.cat.codes.to_numpy().astype(np.int64)
+    codes = np.where(category_codes >= 0, rows.to_numpy().astype(np.int64) * len(categories) + category_codes, -1)
+    shape = (size, len(categories))
+    
+    counts = _grouped_sum(codes, size * len(categories)).reshape(shape)
+    cells = counts if weights is None else _grouped_sum(codes, size * len(categories), weights=weights.to_numpy(dtype=float)).reshape(shape)
+    present_rows = counts.any(axis=1)
+    present_columns = counts.any(axis=0)
+    
+    return pd.DataFrame(
+        cells[present_rows][:, present_columns],
+        index=pd.Index(np.flatnonzero(present_rows).astype(rows.dtype), name=rows.name),
+        columns=pd.CategoricalIndex(categories[present_columns], categories=categories, name=column.name)
+    )
+
+
 class SpotifyFeaturesMixin:
     """
     Mixin class containing enhanced features for SpotifyAnalyzer.
     These methods can be incorporated into the SpotifyAnalyzer class.
     """
     
-    def connect_to_spotify_api(self, client_id, client_secret):
+    def connect_to_spotify_api(self, client_id, client_secret, cache=None):
         """
         Connect to Spotify API using client credentials flow.
         
         Parameters:
         - client_id: Spotify API client ID
         - client_secret: Spotify API client secret
+        - cache: Optional dict-like store (e.g. a shelve) for API responses keyed by endpoint and ID
         
         Returns:
         - Spotify client object
@@ -31,8 +108,54 @@ class SpotifyFeaturesMixin:
         
         auth_manager = SpotifyClientCredentials(client_id=client_id, client_secret=client_secret)
         self.sp = spotipy.Spotify(auth_manager=auth_manager)
+        if cache is not None:
+            self.api_cache = cache
         return self.sp
     
+    def _cached_api_lookup(self, endpoint, ids, fetch, batch_size):
+        """
+        Look up API responses for IDs, only calling the API for IDs not cached yet.
+        
+        Parameters:
+        - endpoint: Name used to namespace the cache keys
+        - ids: IDs to look up
+        - fetch: Function taking a batch of IDs and returning one result per ID
+        - batch_size: Maximum number of IDs per API call
+        
+        Batches are fetched concurrently on up to API_WORKERS threads, within
+        Spotify's rate limit.
+        
+        Returns:
+        - Dictionary mapping each ID to its result
+        """
+        cache = getattr(self, 'api_cache', None)
+        if cache is None:
+            cache = self.api_cache = {}
+        
+        results = {}
+        misses = []
+        for item_id in ids:
+            key = f"{endpoint}:{item_id}"
+            if key in cache:
+                results[item_id] = cache[key]
+            else:
+                misses.append(item_id)
+        
+        def limited_fetch(batch):
+            _API_RATE_LIMITER.wait()
+            return fetch(batch)
+        
+        # Batch requests are independent network round-trips, so issue a few at once
+        batches = [misses[i:i+batch_size] for i in range(0, len(misses), batch_size)]
+        if batches:
+            with ThreadPoolExecutor(max_workers=min(API_WORKERS, len(batches))) as executor:
+                for batch, batch_results in zip(batches, executor.map(limited_fetch, batches)):
+                    for item_id, result in zip(batch, batch_results):
+                        results[item_id] = result
+                        cache[f"{endpoint}:{item_id}"] = result
+        
+        return results
+    
     # ========================
     # Genre Analysis Features
     # ========================
@@ -55,25 +178,61 @@ class SpotifyFeaturesMixin:
         print("Fetching genre information for tracks...")
         unique_tracks = self.df['trackId'].unique()
         
-        # Process in batches of 50 (API limit)
-        genres_map = {}
-        for i in range(0, len(unique_tracks), 50):
-            batch = unique_tracks[i:i+50]
-            results = self.sp.tracks(batch)
-            
-            for track in results['tracks']:
-                if track and track['artists']:
-                    artist_id = track['artists'][0]['id']
-                    artist = self.sp.artist(artist_id)
-                    genres_map[track['id']] = artist['genres']
+        # Resolve each track to its first artist, in batches of 50 (API limit)
+        track_artists = self._cached_api_lookup(
+            "track_artist", unique_tracks,
+            lambda batch: [
+                track['artists'][0]['id'] if track and track['artists'] else None
+                for track in self.sp.tracks(batch)['tracks']
+            ],
+            batch_size=50
+        )
+        
+        # Fetch genres once per artist rather than once per track
+        artist_ids = {artist_id for artist_id in track_artists.values() if artist_id}
+        artist_genres = self._cached_api_lookup(
+            "artist_genres", artist_ids,
+            lambda batch: [
+                artist['genres'] if artist else []
+                for artist in self.sp.artists(batch)['artists']
+            ],
+            batch_size=50
+        )
+        
+        genres_map = {
+            track_id: artist_genres[artist_id]
+            for track_id, artist_id in track_artists.items()
+            if artist_id
+        }
         
         # Add genres to dataframe
         self.df['genres'] = self.df['trackId'].map(genres_map)
         self.df['genres'] = self.df['genres'].apply(lambda x: x if isinstance(x, list) else [])
+        self._genres_long_df = None
         
         print(f"Added genre information for {len(genres_map)} unique tracks")
         return self.df
     
+    def _genres_long(self):
+        """
+        Get the plays exploded to one row per genre, computed once and reused.
+        
+        Returns:
+        - DataFrame with one row per (play, genre), without missing or empty genres
+        """
+        if 'genres' not in self.df.columns:
+            raise ValueError("Genre data not available. Run enrich_with_genres() first")
+        
+        if getattr(self, '_genres_long_df', None) is None:
+            # Explode only the columns the genre analyses read
+            columns = [column for column in GENRE_LONG_COLUMNS if column in self.df.columns]
+            genres_df = self.df[columns].explode('genres')
+            
+            # Filter out None/empty values
+            self._genres_long_df = genres_df[genres_df['genres'].notna() & (genres_df['genres'] != '')]
+        
+        return self._genres_long_df
+    
     def top_genres(self, limit=10):
         """
         Get top genres by play count and time.
@@ -84,20 +243,14 @@ class SpotifyFeaturesMixin:
         Returns:
         - Dictionary with top genres by count and time
         """
-        if 'genres' not in self.df.columns:
-            raise ValueError("Genre data not available. Run enrich_with_genres() first")
-        
-        # Explode the genres list to count each genre separately
-        genres_df = self.df.explode('genres')
-        
-        # Filter out None/empty values
-        genres_df = genres_df[genres_df['genres'].notna() & (genres_df['genres'] != '')]
+        # One row per genre so each genre is counted separately
+        genres_df = self._genres_long()
         
         # By count
         top_by_count = genres_df['genres'].value_counts().nlargest(limit)
         
         # By time
-        genre_time = genres_df.groupby('genres')['hours_played'].sum().nlargest(limit)
+        genre_time = (genres_df.groupby('genres')['msPlayed'].sum().nlargest(limit) / 3600000).rename('hours_played')
         
         return {
             "by_count": top_by_count,
@@ -111,41 +264,35 @@ class SpotifyFeaturesMixin:
         Returns:
         - Dictionary with genre diversity metrics
         """
-        if 'genres' not in self.df.columns:
-            raise ValueError("Genre data not available. Run enrich_with_genres() first")
-        
-        # Explode genres for proper counting
-        genres_df = self.df.explode('genres')
-        
-        # Filter out None/empty values
-        genres_df = genres_df[genres_df['genres'].notna() & (genres_df['genres'] != '')]
+        # One row per genre for proper counting
+        genres_df = self._genres_long()
         
         # Monthly unique genres
         monthly_unique = genres_df.groupby(['year', 'month'])['genres'].nunique()
         
-        # Genre discovery tracking
-        genre_first_listen = genres_df.groupby('genres')['endTime'].min()
-        genres_df['is_first_listen'] = genres_df.apply(
-            lambda row: genre_first_listen[row['genres']] == row['endTime'], 
-            axis=1
-        )
+        # Genre discovery tracking: a genre play is a first listen when it happened
+        # at the genre's earliest listening time. Work on integer genre codes, taking
+        # each genre's first time from a stable sort instead of a lookup per row
+        genre_codes, _ = pd.factorize(genres_df['genres'])
+        times = genres_df['endTime'].to_numpy()
+        order = np.argsort(times, kind='stable')
+        _, first_positions = np.unique(genre_codes[order], return_index=True)
+        first_listen_times = times[order[first_positions]]
+        is_first_listen = times == first_listen_times[genre_codes]
         
         # Monthly ratio of new genres
         monthly_listens = genres_df.groupby(['year', 'month']).size()
-        monthly_new = genres_df[genres_df['is_first_listen']].groupby(['year', 'month']).size()
+        monthly_new = genres_df[is_first_listen].groupby(['year', 'month']).size()
         monthly_ratio = (monthly_new / monthly_listens).fillna(0)
         
-        # Flatten all genres into a set for total count
-        all_genres = set()
-        for genres_list in self.df['genres'].dropna():
-            if isinstance(genres_list, list):
-                all_genres.update(genres_list)
+        # Distinct genres come straight from the already exploded column
+        all_genres = genres_df['genres'].unique()
         
         return {
             "monthly_unique": monthly_unique,
             "monthly_discovery_ratio": monthly_ratio,
             "unique_genres_count": len(all_genres),
-            "all_genres": list(all_genres)
+            "all_genres": all_genres.tolist()
         }
     
     def plot_genre_analysis(self):
@@ -218,23 +365,20 @@ class SpotifyFeaturesMixin:
         print("Fetching audio features for tracks...")
         unique_tracks = self.df['trackId'].unique()
         
-        # Process in batches of 100 (API limit)
-        features_map = {}
-        for i in range(0, len(unique_tracks), 100):
-            batch = unique_tracks[i:i+100]
-            results = self.sp.audio_features(batch)
-            
-            for track_features in results:
-                if track_features:
-                    features_map[track_features['id']] = track_features
-        
-        # Extract relevant features to separate columns
-        for feature in ['danceability', 'energy', 'key', 'loudness', 'mode', 
-                        'speechiness', 'acousticness', 'instrumentalness', 
-                        'liveness', 'valence', 'tempo']:
-            self.df[feature] = self.df['trackId'].apply(
-                lambda x: features_map.get(x, {}).get(feature, None)
-            )
+        # Process in batches of 100 (API limit), skipping tracks fetched before
+        features_map = self._cached_api_lookup(
+            "audio_features", unique_tracks, self.sp.audio_features, batch_size=100
+        )
+        features_map = {track_id: features for track_id, features in features_map.items() if features}
+        
+        # Extract relevant features to separate columns with one join on track ID
+        # float32 is plenty for these bounded features and halves the memory they take
+        features_df = (
+            pd.DataFrame.from_dict(features_map, orient='index')
+            .reindex(columns=AUDIO_FEATURE_COLUMNS)
+            .astype(np.float32)
+        )
+        self.df = self.df.drop(columns=AUDIO_FEATURE_COLUMNS, errors='ignore').join(features_df, on='trackId')
         
         print(f"Added audio features for {len(features_map)} unique tracks")
         return self.df
@@ -255,20 +399,18 @@ class SpotifyFeaturesMixin:
         if not available_features:
             raise ValueError("No audio features available. Run enrich_with_audio_features() first")
         
-        # Calculate weighted averages based on listening time
-        weighted_avgs = {}
-        total_time = self.df['hours_played'].sum()
-        
-        for feature in available_features:
-            # Filter out None/NaN values
-            valid_data = self.df[self.df[feature].notna()]
-            if len(valid_data) > 0:
-                weighted_avg = (valid_data[feature] * valid_data['hours_played']).sum() / valid_data['hours_played'].sum()
-                weighted_avgs[feature] = weighted_avg
-            else:
-                weighted_avgs[feature] = None
+        # Calculate weighted averages based on listening time for all features at once,
+        # leaving out each feature's missing values from both sums
+        values = self.df[available_features].to_numpy(dtype=float, na_value=np.nan)
+        valid = ~np.isnan(values)
+        ms = self.df['msPlayed'].to_numpy(dtype=float)
+        weighted_sums = np.where(valid, values, 0.0).T @ ms
+        total_ms = valid.T @ ms
         
-        return weighted_avgs
+        return {
+            feature: weighted_sums[i] / total_ms[i] if valid[:, i].any() else None
+            for i, feature in enumerate(available_features)
+        }
     
     def classify_moods(self):
         """
@@ -282,24 +424,21 @@ class SpotifyFeaturesMixin:
         if not all(feature in self.df.columns for feature in required_features):
             raise ValueError("Energy and valence features required. Run enrich_with_audio_features() first")
         
-        # Define mood classification function based on valence and energy
-        def get_mood(energy, valence):
-            if energy > 0.5 and valence > 0.5:
-                return "Happy"
-            elif energy > 0.5 and valence <= 0.5:
-                return "Angry"
-            elif energy <= 0.5 and valence > 0.5:
-                return "Relaxed"
-            else:
-                return "Sad"
-        
-        # Apply mood classification
-        self.df['mood'] = self.df.apply(
-            lambda row: get_mood(row['energy'], row['valence']) 
-            if pd.notna(row['energy']) and pd.notna(row['valence']) 
-            else None, 
-            axis=1
-        )
+        # Classify moods from the valence and energy quadrants in one vectorized pass
+        energy = self.df['energy'].to_numpy(dtype=float, na_value=np.nan)
+        valence = self.df['valence'].to_numpy(dtype=float, na_value=np.nan)
+        high_energy = energy > 0.5
+        high_valence = valence > 0.5
+        
+        moods = np.select(
+            [high_energy & high_valence, high_energy, high_valence],
+            ["Happy", "Angry", "Relaxed"],
+            default="Sad"
+        ).astype(object)
+        
+        # Tracks missing either feature get no mood
+        moods[np.isnan(energy) | np.isnan(valence)] = None
+        self.df['mood'] = pd.Categorical(moods, categories=MOOD_CATEGORIES)
         
         return self.df
     
@@ -323,17 +462,19 @@ class SpotifyFeaturesMixin:
                 "by_time": pd.Series()
             }
         
-        # Mood distribution
+        # Mood distribution, leaving out moods that never occur
         mood_counts = mood_df['mood'].value_counts()
+        mood_counts = mood_counts[mood_counts > 0]
         
         # Mood by time
-        mood_time = mood_df.groupby('mood')['hours_played'].sum()
+        mood_time = (mood_df.groupby('mood', observed=True)['msPlayed'].sum() / 3600000).rename('hours_played')
         
         # Mood by time of day
-        mood_by_hour = mood_df.groupby(['hour', 'mood'])['minutes_played'].sum().unstack(fill_value=0)
+        mood_by_hour = _category_matrix(mood_df['hour'], 24, mood_df['mood'], weights=mood_df['minutes_played'])
         
         # Mood by day of week
-        mood_by_weekday = mood_df.groupby(['weekday_name', 'mood'])['minutes_played'].sum().unstack(fill_value=0)
+        mood_by_weekday = _category_matrix(mood_df['weekday'], 7, mood_df['mood'], weights=mood_df['minutes_played'])
+        mood_by_weekday.index = pd.Index(DAY_NAMES[mood_by_weekday.index], name='weekday_name')
         
         return {
             "by_count": mood_counts,
@@ -356,17 +497,22 @@ class SpotifyFeaturesMixin:
             raise ValueError(f"Feature {feature} not available. Run enrich_with_audio_features() first")
         
         # Filter out None/NaN values
-        valid_data = self.df[self.df[feature].notna()]
+        values = self.df[feature].to_numpy(dtype=float, na_value=np.nan)
+        valid = ~np.isnan(values)
         
-        if len(valid_data) == 0:
+        if not valid.any():
             return pd.Series()
         
-        # Monthly average of the feature
-        monthly_avg = valid_data.groupby(['year', 'month']).apply(
-            lambda x: (x[feature] * x['hours_played']).sum() / x['hours_played'].sum()
-        )
+        # Monthly listening-time weighted average of the feature, from two sums
+        # over the analyzer's shared (year, month) codes
+        month_codes, month_index = self._month_factors
+        month_codes = month_codes[valid]
+        ms = self._ms[valid]
+        weighted = np.bincount(month_codes, weights=values[valid] * ms, minlength=len(month_index))
+        total_ms = np.bincount(month_codes, weights=ms, minlength=len(month_index))
+        present = np.bincount(month_codes, minlength=len(month_index)) > 0
         
-        return monthly_avg
+        return pd.Series(weighted[present] / total_ms[present], index=month_index[present])
     
     def plot_audio_features_analysis(self):
         """
@@ -446,41 +592,80 @@ class SpotifyFeaturesMixin:
     # Listening Session Analysis
     # ==============================
     
-    def detect_sessions(self, gap_threshold=30):
+    def tag_sessions(self, gap_threshold=30):
         """
-        Detect listening sessions based on time gaps between tracks.
+        Tag every track with the listening session it belongs to, based on time gaps between tracks.
         
         Parameters:
         - gap_threshold: Time gap in minutes that defines a new session
         
         Returns:
-        - List of session dataframes
+        - Number of sessions detected
         """
         if self.df is None or len(self.df) == 0:
-            return []
-        
-        # Sort by timestamp
-        sorted_df = self.df.sort_values('endTime')
+            self._sessions_df = None
+            self.session_count = 0
+            return 0
         
-        # Calculate time difference between consecutive tracks
-        sorted_df['time_diff'] = sorted_df['endTime'].diff()
+        # Plays are already in endTime order on load, so only sort if they were reordered since
+        if self.df['endTime'].is_monotonic_increasing:
+            sorted_df = self.df.copy()
+        else:
+            sorted_df = self.df.sort_values('endTime', kind='mergesort')
         
-        # Convert to minutes
-        sorted_df['time_diff_minutes'] = sorted_df['time_diff'].dt.total_seconds() / 60
+        # Start of each track (endTime - duration), computed once for the session metrics
+        sorted_df['track_start'] = sorted_df['endTime'] - pd.to_timedelta(sorted_df['minutes_played'], unit='m')
         
-        # Identify new sessions (first track or gap > threshold)
-        sorted_df['new_session'] = sorted_df['time_diff_minutes'].isna() | (sorted_df['time_diff_minutes'] > gap_threshold)
+        # Identify new sessions (first track or gap > threshold) from the raw nanosecond gaps
+        end_ns = sorted_df['endTime'].to_numpy().view('i8')
+        new_session = np.empty(len(end_ns), dtype=bool)
+        new_session[0] = True
+        new_session[1:] = np.diff(end_ns) > gap_threshold * 60 * 1_000_000_000
         
         # Assign session IDs
-        sorted_df['session_id'] = sorted_df['new_session'].cumsum() - 1
+        sorted_df['session_id'] = np.cumsum(new_session) - 1
         
-        # Group by session ID
-        sessions = [group for _, group in sorted_df.groupby('session_id')]
+        # Keep only the tagged frame; the session statistics are grouped reductions over it
+        self._sessions_df = sorted_df
+        self._session_summary_df = None
+        self.session_count = int(new_session.sum())
         
-        # Store sessions as instance variable
-        self.sessions = sessions
+        return self.session_count
+    
+    def _session_summary(self):
+        """
+        Get one row of aggregates per tagged session, computed in a single grouped pass and reused.
         
-        return sessions
+        Returns:
+        - DataFrame indexed by session_id with n_tracks, n_artists, start, end and first_minutes
+        """
+        if getattr(self, '_session_summary_df', None) is None:
+            # The tagged frame is sorted by endTime, so first/last rows bound each session
+            self._session_summary_df = self._sessions_df.groupby('session_id').agg(
+                n_tracks=('endTime', 'size'),
+                n_artists=('artistName', 'nunique'),
+                start=('track_start', 'first'),
+                end=('endTime', 'last'),
+                first_minutes=('minutes_played', 'first')
+            )
+        
+        return self._session_summary_df
+    
+    def detect_sessions(self, gap_threshold=30):
+        """
+        Detect listening sessions based on time gaps between tracks.
+        
+        Parameters:
+        - gap_threshold: Time gap in minutes that defines a new session
+        
+        Returns:
+        - List of session dataframes
+        """
+        if not self.tag_sessions(gap_threshold):
+            return []
+        
+        # Only split the tagged frame into per-session frames for callers that want them
+        return [group for _, group in self._sessions_df.groupby('session_id')]
     
     def session_statistics(self):
         """
@@ -489,11 +674,11 @@ class SpotifyFeaturesMixin:
         Returns:
         - Dictionary of session statistics
         """
-        if not hasattr(self, 'sessions') or not self.sessions:
-            self.detect_sessions()
+        if not getattr(self, 'session_count', 0):
+            self.tag_sessions()
         
         # Check if we have any sessions
-        if not self.sessions:
+        if not self.session_count:
             return {
                 "total_sessions": 0,
                 "avg_session_length": 0,
@@ -502,41 +687,29 @@ class SpotifyFeaturesMixin:
                 "avg_artists_per_session": 0
             }
         
-        # Calculate session lengths in minutes
-        session_lengths = []
-        tracks_per_session = []
-        artists_per_session = []
-        
-        for session in self.sessions:
-            # Session length = time between first and last track + duration of last track
-            if len(session) > 1:
-                # First track start time (endTime - duration)
-                first_track_start = session['endTime'].min() - pd.Timedelta(minutes=session.iloc[0]['minutes_played'])
-                # Last track end time
-                last_track_end = session['endTime'].max()
-                length_minutes = (last_track_end - first_track_start).total_seconds() / 60
-            else:
-                length_minutes = session['minutes_played'].iloc[0]
-            
-            session_lengths.append(length_minutes)
-            tracks_per_session.append(len(session))
-            artists_per_session.append(session['artistName'].nunique())
+        # Per-session metrics from the shared session summary
+        summary = self._session_summary()
+        tracks_per_session = summary['n_tracks']
+        artists_per_session = summary['n_artists']
+        
+        # Session length = time between first track start and last track end
+        span_minutes = (summary['end'] - summary['start']).dt.total_seconds() / 60
+        session_lengths = span_minutes.where(tracks_per_session > 1, summary['first_minutes']).to_numpy()
         
-        # Create histogram of session lengths
-        hist_edges = [0, 15, 30, 60, 120, 240, float('inf')]
-        hist_counts, _ = np.histogram(session_lengths, bins=hist_edges)
-        hist_ranges = [f"{low}-{high}min" if high < float('inf') else f"{low}min+" for low, high in zip(hist_edges[:-1], hist_edges[1:])]
-        length_distribution = dict(zip(hist_ranges, hist_counts))
+        # Create histogram of session lengths by locating each length among the inner edges
+        bin_indices = np.searchsorted(SESSION_LENGTH_EDGES[1:-1], session_lengths, side='right')
+        hist_counts = np.bincount(bin_indices, minlength=len(SESSION_LENGTH_BINS))
+        length_distribution = dict(zip(SESSION_LENGTH_BINS, hist_counts))
         
         return {
-            "total_sessions": len(self.sessions),
+            "total_sessions": self.session_count,
             "avg_session_length": np.mean(session_lengths),
             "median_session_length": np.median(session_lengths),
             "avg_tracks_per_session": np.mean(tracks_per_session),
             "avg_artists_per_session": np.mean(artists_per_session),
             "session_length_distribution": length_distribution,
-            "longest_session_minutes": max(session_lengths) if session_lengths else 0,
-            "shortest_session_minutes": min(session_lengths) if session_lengths else 0
+            "longest_session_minutes": session_lengths.max() if len(session_lengths) else 0,
+            "shortest_session_minutes": session_lengths.min() if len(session_lengths) else 0
         }
     
     def session_patterns(self):
@@ -546,44 +719,28 @@ class SpotifyFeaturesMixin:
         Returns:
         - Dictionary of session patterns
         """
-        if not hasattr(self, 'sessions') or not self.sessions:
-            self.detect_sessions()
+        if not getattr(self, 'session_count', 0):
+            self.tag_sessions()
         
         # Check if we have any sessions
-        if not self.sessions:
+        if not self.session_count:
             return {
                 "by_hour": {},
                 "by_weekday": {},
                 "by_month": {}
             }
         
-        # Extract start time of each session
-        session_starts = []
-        session_weekdays = []
-        session_months = []
-        
-        for session in self.sessions:
-            # First track start time (endTime - duration)
-            start_time = session['endTime'].min() - pd.Timedelta(minutes=session.iloc[0]['minutes_played'])
-            session_starts.append(start_time.hour)
-            session_weekdays.append(start_time.strftime('%A'))
-            session_months.append(start_time.strftime('%B'))
-        
-        # Create distributions
-        hour_counts = Counter(session_starts)
-        weekday_counts = Counter(session_weekdays)
-        month_counts = Counter(session_months)
+        # Start time of each session is the start of its first track
+        start_times = self._session_summary()['start']
         
-        # Ensure all hours, weekdays, and months are represented
-        all_hours = range(24)
-        hour_distribution = {hour: hour_counts.get(hour, 0) for hour in all_hours}
+        # Count sessions per hour, weekday and month, keeping every slot even when empty
+        hour_counts = np.bincount(start_times.dt.hour, minlength=24)
+        weekday_counts = np.bincount(start_times.dt.weekday, minlength=7)
+        month_counts = np.bincount(start_times.dt.month - 1, minlength=12)
         
-        all_weekdays = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        weekday_distribution = {weekday: weekday_counts.get(weekday, 0) for weekday in all_weekdays}
-        
-        all_months = ['January', 'February', 'March', 'April', 'May', 'June', 
-                     'July', 'August', 'September', 'October', 'November', 'December']
-        month_distribution = {month: month_counts.get(month, 0) for month in all_months}
+        hour_distribution = dict(enumerate(hour_counts.tolist()))
+        weekday_distribution = dict(zip(DAY_NAMES, weekday_counts.tolist()))
+        month_distribution = dict(zip(MONTH_NAMES, month_counts.tolist()))
         
         return {
             "by_hour": hour_distribution,
@@ -598,53 +755,53 @@ class SpotifyFeaturesMixin:
         Returns:
         - Dictionary of session content analysis
         """
-        if not hasattr(self, 'sessions') or not self.sessions:
-            self.detect_sessions()
+        if not getattr(self, 'session_count', 0):
+            self.tag_sessions()
         
         # Check if we have any sessions
-        if not self.sessions:
+        if not self.session_count:
             return {
                 "avg_artist_continuity": 0,
                 "avg_unique_artists_ratio": 0,
                 "session_types": Counter()
             }
         
-        # Calculate metrics for each session
-        artist_continuity = []  # % of consecutive tracks by same artist
-        unique_artists_ratio = []  # unique artists / total tracks
-        
-        for session in self.sessions:
-            if len(session) > 1:
-                # Calculate artist continuity
-                same_artist_count = sum(session['artistName'].iloc[i] == session['artistName'].iloc[i+1] 
-                                        for i in range(len(session)-1))
-                continuity = same_artist_count / (len(session) - 1)
-                artist_continuity.append(continuity)
-                
-                # Calculate unique artists ratio
-                unique_ratio = session['artistName'].nunique() / len(session)
-                unique_artists_ratio.append(unique_ratio)
-        
-        # Classify sessions
-        session_types = []
-        for session in self.sessions:
-            # Single-artist sessions
-            if len(session) > 1 and session['artistName'].nunique() == 1:
-                session_types.append("single_artist")
-            # Album listening (same artist, consecutive tracks)
-            elif len(session) > 3 and session['artistName'].nunique() <= 2:
-                session_types.append("album_listening")
-            # Variety sessions (many different artists)
-            elif len(session) > 1 and session['artistName'].nunique() / len(session) > 0.8:
-                session_types.append("variety")
-            # Default
-            else:
-                session_types.append("mixed")
+        # Per-session metrics from the shared session summary
+        summary = self._session_summary()
+        track_counts = summary['n_tracks'].to_numpy()
+        artist_counts = summary['n_artists'].to_numpy()
+        sessions_df = self._sessions_df
+        session_ids = sessions_df['session_id'].to_numpy()
+        
+        # Artist continuity: % of consecutive tracks in a session by the same artist
+        artist_codes, _ = pd.factorize(sessions_df['artistName'])
+        same_artist = np.zeros(len(sessions_df), dtype=bool)
+        same_artist[1:] = (artist_codes[1:] == artist_codes[:-1]) & (session_ids[1:] == session_ids[:-1])
+        same_artist_counts = np.bincount(session_ids, weights=same_artist, minlength=len(track_counts))
+        
+        multi_track = track_counts > 1
+        artist_continuity = same_artist_counts[multi_track] / (track_counts[multi_track] - 1)
+        # Unique artists ratio: unique artists / total tracks
+        unique_artists_ratio = artist_counts[multi_track] / track_counts[multi_track]
+        
+        # Classify sessions, first matching type wins
+        session_types = np.select(
+            [
+                # Single-artist sessions
+                multi_track & (artist_counts == 1),
+                # Album listening (same artist, consecutive tracks)
+                (track_counts > 3) & (artist_counts <= 2),
+                # Variety sessions (many different artists)
+                multi_track & (artist_counts / track_counts > 0.8),
+            ],
+            ["single_artist", "album_listening", "variety"],
+            default="mixed"
+        )
         
         return {
-            "avg_artist_continuity": np.mean(artist_continuity) if artist_continuity else 0,
-            "avg_unique_artists_ratio": np.mean(unique_artists_ratio) if unique_artists_ratio else 0,
-            "session_types": Counter(session_types)
+            "avg_artist_continuity": np.mean(artist_continuity) if len(artist_continuity) else 0,
+            "avg_unique_artists_ratio": np.mean(unique_artists_ratio) if len(unique_artists_ratio) else 0,
+            "session_types": Counter(session_types.tolist())
         }
     
     def plot_session_analysis(self):
@@ -658,11 +815,11 @@ class SpotifyFeaturesMixin:
         import seaborn as sns
         
         # Make sure sessions are detected
-        if not hasattr(self, 'sessions') or not self.sessions:
-            self.detect_sessions()
+        if not getattr(self, 'session_count', 0):
+            self.tag_sessions()
         
         # Check if we have any sessions
-        if not self.sessions:
+        if not self.session_count:
             return {}
         
         # Get statistics
@@ -727,38 +884,46 @@ class SpotifyFeaturesMixin:
         # Check if we have audio features
         has_audio_features = all(col in self.df.columns for col in ['energy', 'tempo'])
         
-        # Define context rules
-        def determine_context(row):
-            # Default values if audio features missing
-            energy = row.get('energy', 0.5) if has_audio_features else 0.5
-            tempo = row.get('tempo', 120) if has_audio_features else 120
-            
-            # Workout: high energy, high tempo, morning/evening
-            if has_audio_features and energy > 0.7 and tempo > 120 and (5 <= row['hour'] <= 9 or 17 <= row['hour'] <= 20):
-                return "workout"
-            
-            # Commute: weekday, typical commute hours
-            elif row['weekday'] < 5 and ((7 <= row['hour'] <= 9) or (16 <= row['hour'] <= 19)):
-                return "commute"
-            
-            # Work: weekday, working hours, moderate energy
-            elif row['weekday'] < 5 and 9 <= row['hour'] <= 17 and (not has_audio_features or energy < 0.7):
-                return "work"
-            
-            # Party: weekend evenings, high energy
-            elif row['weekday'] >= 5 and row['hour'] >= 20 and (not has_audio_features or energy > 0.7):
-                return "party"
-            
-            # Relaxation: evenings, low energy
-            elif row['hour'] >= 20 and (not has_audio_features or energy < 0.5):
-                return "relaxation"
-            
-            # Default: other
-            else:
-                return "other"
+        # Pull the rule inputs out once and evaluate every rule as a boolean mask
+        hour = self.df['hour'].to_numpy()
+        weekday = self.df['weekday'].to_numpy()
+        is_weekday = weekday < 5
+        
+        if has_audio_features:
+            # Compare in float32, the stored feature precision, so values sitting exactly
+            # on a threshold are not nudged across it by upcasting
+            energy = self.df['energy'].to_numpy(dtype=np.float32, na_value=np.nan)
+            tempo = self.df['tempo'].to_numpy(dtype=np.float32, na_value=np.nan)
+            high_energy = energy > 0.7
+            workout_audio = high_energy & (tempo > 120)
+            moderate_energy = energy < 0.7
+            low_energy = energy < 0.5
+        else:
+            # Without audio features only the time-based rules apply
+            no_features = np.zeros(len(hour), dtype=bool)
+            workout_audio = no_features
+            high_energy = moderate_energy = low_energy = ~no_features
+        
+        # Same rule order as before: the first matching context wins
+        contexts = np.select(
+            [
+                # Workout: high energy, high tempo, morning/evening
+                workout_audio & (((hour >= 5) & (hour <= 9)) | ((hour >= 17) & (hour <= 20))),
+                # Commute: weekday, typical commute hours
+                is_weekday & (((hour >= 7) & (hour <= 9)) | ((hour >= 16) & (hour <= 19))),
+                # Work: weekday, working hours, moderate energy
+                is_weekday & (hour >= 9) & (hour <= 17) & moderate_energy,
+                # Party: weekend evenings, high energy
+                ~is_weekday & (hour >= 20) & high_energy,
+                # Relaxation: evenings, low energy
+                (hour >= 20) & low_energy,
+            ],
+            np.arange(len(CONTEXT_CATEGORIES) - 1),
+            default=len(CONTEXT_CATEGORIES) - 1
+        )
         
-        # Apply context categorization
-        self.df['context'] = self.df.apply(determine_context, axis=1)
+        self.df['context'] = pd.Categorical.from_codes(contexts, categories=CONTEXT_CATEGORIES)
+        self._context_stats = None
         
         return self.df
     
@@ -772,25 +937,44 @@ class SpotifyFeaturesMixin:
         if 'context' not in self.df.columns:
             self.categorize_listening_contexts()
         
-        # Context distribution
-        context_counts = self.df['context'].value_counts()
-        context_distribution = context_counts / len(self.df)
+        # Reuse the statistics until the contexts are recategorized or the frame is replaced
+        cached = getattr(self, '_context_stats', None)
+        if cached is not None and cached[0] is self.df:
+            return cached[1]
+        
+        # Play count and minutes per context from the categorical codes, leaving out
+        # contexts that never occur
+        contexts = self.df['context']
+        categories = contexts.cat.categories
+        codes = contexts.cat.codes.to_numpy()
+        counts = _grouped_sum(codes, len(categories))
+        minutes = _grouped_sum(codes, len(categories), weights=self.df['minutes_played'].to_numpy(dtype=float))
+        present = counts > 0
+        context_index = pd.CategoricalIndex(categories[present], categories=categories, name='context')
+        
+        # Context distribution, most common first
+        context_counts = pd.Series(counts[present], index=context_index, name='count')
+        context_distribution = context_counts.sort_values(ascending=False, kind='stable') / len(self.df)
         
         # Time spent in each context
-        context_time = self.df.groupby('context')['minutes_played'].sum()
+        context_time = pd.Series(minutes[present], index=context_index, name='minutes_played')
         
         # Context by hour
-        context_by_hour = self.df.groupby(['hour', 'context']).size().unstack(fill_value=0)
+        context_by_hour = _category_matrix(self.df['hour'], 24, self.df['context'])
         
         # Context by weekday
-        context_by_weekday = self.df.groupby(['weekday_name', 'context']).size().unstack(fill_value=0)
+        context_by_weekday = _category_matrix(self.df['weekday'], 7, self.df['context'])
+        context_by_weekday.index = pd.Index(DAY_NAMES[context_by_weekday.index], name='weekday_name')
         
-        return {
+        stats = {
             "distribution": context_distribution,
             "by_time": context_time,
             "by_hour": context_by_hour,
             "by_weekday": context_by_weekday
         }
+        self._context_stats = (self.df, stats)
+        
+        return stats
     
     def train_context_predictor(self):
         """
@@ -822,25 +1006,52 @@ class SpotifyFeaturesMixin:
         if len(available_features) < 2:
             raise ValueError("Not enough features available for prediction")
         
-        # Filter out rows with missing values
-        train_data = self.df.dropna(subset=available_features + ['context'])
+        # Filter out rows with missing values, looking only at the columns the model uses
+        train_data = self.df[available_features + ['context']]
+        complete = train_data.notna().all(axis=1).to_numpy()
         
-        if len(train_data) == 0:
+        if not complete.any():
             raise ValueError("No valid data available for training after filtering missing values")
         
-        # Prepare data
-        X = train_data[available_features].values
-        y = train_data['context'].values
+        # Prepare data as the tree stores it: contiguous float32 features and integer labels
+        X = np.ascontiguousarray(train_data[available_features].to_numpy(dtype=np.float32)[complete])
+        y = pd.Categorical(train_data['context'])[complete]
         
         # Train a simple model (Decision Tree for interpretability)
         self.context_model = DecisionTreeClassifier(max_depth=5)
-        self.context_model.fit(X, y)
+        self.context_model.fit(X, y.codes.astype(np.int32))
         
-        # Save feature names for prediction
+        # Save feature names and the context each label code stands for, for prediction
         self.context_features = available_features
+        self.context_classes = np.asarray(y.categories)
+        self._context_lut = self._context_lookup_table()
         
         return self.context_model
     
+    def _context_lookup_table(self):
+        """
+        Tabulate the trained context model over every cell its splits carve out.
+        
+        A decision tree only compares each feature against its own split thresholds, so
+        its prediction is constant between consecutive thresholds. Predicting one point
+        per cell once gives an exact lookup table for single predictions.
+        
+        Returns:
+        - Tuple of (per-feature sorted thresholds, array of contexts indexed by cell)
+        """
+        tree = self.context_model.tree_
+        thresholds = [np.unique(tree.threshold[tree.feature == i]) for i in range(len(self.context_features))]
+        
+        # One point inside each cell: below the first threshold, between neighbours, above the last
+        points = [
+            np.concatenate([[t[0] - 1], (t[:-1] + t[1:]) / 2, [t[-1] + 1]]) if len(t) else np.zeros(1)
+            for t in thresholds
+        ]
+        grid = np.stack([axis.ravel() for axis in np.meshgrid(*points, indexing='ij')], axis=1)
+        codes = self.context_model.predict(grid).reshape([len(axis) for axis in points])
+        
+        return thresholds, self.context_classes[codes]
+    
     def predict_context(self, **kwargs):
         """
         Predict listening context based on provided features.
@@ -861,10 +1072,38 @@ class SpotifyFeaturesMixin:
             else:
                 raise ValueError(f"Missing required feature: {feature}")
         
-        # Make prediction
-        prediction = self.context_model.predict([features])[0]
+        return self.predict_contexts([features])[0]
+    
+    def predict_contexts(self, features):
+        """
+        Predict listening contexts for many feature rows at once.
+        
+        Parameters:
+        - features: DataFrame with the model's feature columns, or an (N, F) array
+          with columns in the order of context_features
+        
+        Returns:
+        - Array of predicted contexts, one per row
+        """
+        if not hasattr(self, 'context_model'):
+            self.train_context_predictor()
+        elif getattr(self, '_context_lut', None) is None:
+            self._context_lut = self._context_lookup_table()
+        
+        if isinstance(features, pd.DataFrame):
+            features = features[self.context_features]
+        
+        # Compare in float32 like the tree does
+        values = np.asarray(features, dtype=np.float32).reshape(-1, len(self.context_features))
         
-        return prediction
+        # Look every row up by cell; the tree sends values equal to a threshold left
+        thresholds, contexts = self._context_lut
+        cells = tuple(
+            np.searchsorted(feature_thresholds, values[:, i], side='left')
+            for i, feature_thresholds in enumerate(thresholds)
+        )
+        
+        return contexts[cells]
     
     def suggest_for_context(self, context, limit=5):
         """
@@ -881,13 +1120,16 @@ class SpotifyFeaturesMixin:
             self.categorize_listening_contexts()
         
         # Filter by context
-        context_df = self.df[self.df['context'] == context]
+        in_context = (self.df['context'] == context).to_numpy()
         
-        if len(context_df) == 0:
+        if not in_context.any():
             return []
         
-        # Get top tracks for this context
-        top_tracks = context_df.groupby(['trackName', 'artistName']).size().nlargest(limit)
+        # Get top tracks for this context by counting the analyzer's shared (track, artist) codes
+        track_codes, track_labels = self._track_factors
+        counts = _grouped_sum(track_codes[in_context], len(track_labels))
+        top_tracks = _top_series(counts, track_labels, limit)
+        top_tracks = top_tracks[top_tracks > 0]
         
         # Format as list of dicts
         suggestions = [
@@ -905,7 +1147,6 @@ class SpotifyFeaturesMixin:
         - Dictionary of matplotlib figures
         """
         import matplotlib.pyplot as plt
-        import seaborn as sns
         
         # Make sure contexts are categorized
         if 'context' not in self.df.columns:
@@ -929,8 +1170,13 @@ class SpotifyFeaturesMixin:
         
         # Context by hour heatmap
         fig3, ax3 = plt.subplots(figsize=(12, 8))
-        if not stats["by_hour"].empty:
-            sns.heatmap(stats["by_hour"], cmap="YlGnBu", ax=ax3)
+        by_hour = stats["by_hour"]
+        if not by_hour.empty:
+            # Draw the precomputed count matrix directly rather than through seaborn
+            image = ax3.imshow(by_hour.to_numpy(), cmap="YlGnBu", aspect='auto')
+            fig3.colorbar(image, ax=ax3)
+            ax3.set_xticks(range(by_hour.shape[1]), by_hour.columns.astype(str))
+            ax3.set_yticks(range(by_hour.shape[0]), by_hour.index.astype(str))
             ax3.set_title("Context by Hour of Day")
             ax3.set_xlabel("Context")
             ax3.set_ylabel("Hour")
@@ -951,14 +1197,14 @@ def enhance_spotify_analyzer():
     """
     from spotify_analyzer import SpotifyAnalyzer
     
-    # Get all methods from the mixin
-    mixin_methods = [method for method in dir(SpotifyFeaturesMixin) 
-                    if callable(getattr(SpotifyFeaturesMixin, method)) 
-                    and not method.startswith('__')]
+    # Take the methods straight from the mixin's own namespace
+    mixin_methods = {
+        name: method for name, method in vars(SpotifyFeaturesMixin).items()
+        if callable(method) and not name.startswith('__')
+    }
     
     # Add each method to the SpotifyAnalyzer class
-    for method_name in mixin_methods:
-        method = getattr(SpotifyFeaturesMixin, method_name)
+    for method_name, method in mixin_methods.items():
         setattr(SpotifyAnalyzer, method_name, method)
     
     print(f"Enhanced SpotifyAnalyzer with {len(mixin_methods)} new methods")
@@ -967,16 +1213,20 @@ def enhance_spotify_analyzer():
 
 # Example usage in external code:
 # 
-from spotify_features import enhance_spotify_analyzer
-from spotify_analyzer import SpotifyAnalyzer
-import os
+if __name__ == "__main__":
+    from spotify_features import enhance_spotify_analyzer
+    from spotify_analyzer import SpotifyAnalyzer
+    import os
+    import shelve
 
-enhance_spotify_analyzer()
-analyzer = SpotifyAnalyzer(["StreamingHistory_music_0.json"])
+    enhance_spotify_analyzer()
+    analyzer = SpotifyAnalyzer(["StreamingHistory_music_0.json"])
 
-#Client id and secret from environment variables
-analyzer.connect_to_spotify_api(client_id=os.environ.get('SPOTIPY_CLIENT_ID'), client_secret=os.environ.get('SPOTIPY_CLIENT_SECRET'))
+    # Keep API responses between runs so repeat runs only fetch tracks not seen before
+    with shelve.open(".spotify_api_cache") as api_cache:
+        #Client id and secret from environment variables
+        analyzer.connect_to_spotify_api(client_id=os.environ.get('SPOTIPY_CLIENT_ID'), client_secret=os.environ.get('SPOTIPY_CLIENT_SECRET'), cache=api_cache)
 
-analyzer.enrich_with_genres()
-top_genres = analyzer.top_genres()
+        analyzer.enrich_with_genres()
+    top_genres = analyzer.top_genres()
 
@@ -1,25 +1,75 @@
-import json,os,requests
+import json,os,time,requests
+from concurrent.futures import ThreadPoolExecutor
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    _json_loads = json.loads
+
+# Number of Spotify track searches in flight at once
+SEARCH_WORKERS = 20
+
+# Refresh the access token this many seconds before Spotify says it expires
+TOKEN_EXPIRY_MARGIN = 60
+
+# One pooled session for every request, so connections are kept alive between
+# searches. Rate limited (429) and server error responses are retried with backoff
+_SESSION = requests.Session()
+_SESSION.mount('https://', HTTPAdapter(
+    pool_maxsize=SEARCH_WORKERS,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
+class TokenCache:
+    """Client credentials access token, reused until shortly before it expires"""
+    def __init__(self):
+        self.token = None
+        self.expiry = 0.0
+
+    def valid(self):
+        return self.token is not None and time.time() < self.expiry - TOKEN_EXPIRY_MARGIN
+
+    def store(self, token, expires_in):
+        self.token = token
+        self.expiry = time.time() + expires_in
+
+_TOKEN_CACHE = TokenCache()
 
 def load_unique_songs():
     unique_songs_file = "unique_songs.json"
 
-    with open(unique_songs_file, 'r', encoding='utf-8') as file:
-        unique_songs_list = json.load(file)
+    with open(unique_songs_file, 'rb') as file:
+        unique_songs_list = _json_loads(file.read())
 
     print(f"Looking up lyrics information for {len(unique_songs_list)} songs...")
 
-    for i, song in enumerate(unique_songs_list):
-        artist = song["artistName"]
-        track = song["trackName"]
-        
-        # Add basic song info
-        song_info = {
-            "artistName": artist,
-            "trackName": track
-        }
+    token = getToken()
+
+    # Searches are network round-trips, so run a bounded number of them at once
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        track_ids = executor.map(
+            lambda song: search_track(_SESSION, token, song["trackName"], song["artistName"]),
+            unique_songs_list
+        )
+
+        songs_info = []
+        for song, track_id in zip(unique_songs_list, track_ids):
+            # Add basic song info
+            songs_info.append({
+                "artistName": song["artistName"],
+                "trackName": song["trackName"],
+                "trackId": track_id
+            })
+
+    return songs_info
 
 # Function to search for a track
 def getToken():
+    if _TOKEN_CACHE.valid():
+        return _TOKEN_CACHE.token
+
     try:
         client_id = os.getenv('SPOTIFY_CLIENT_ID')
         client_secret = os.getenv('SPOTIFY_CLIENT_SECRET')
@@ -32,7 +82,7 @@ def getToken():
             'client_id': client_id,
             'client_secret': client_secret
         }
-        response = requests.post(
+        response = _SESSION.post(
             f'https://accounts.spotify.com/api/token',
             headers=headers,
             data=data
@@ -41,6 +91,7 @@ def getToken():
         response.raise_for_status()  # Raise exception for HTTP errors
         
         data = response.json()
+        _TOKEN_CACHE.store(data['access_token'], data.get('expires_in', 3600))
         return data['access_token']
        
     except Exception as error:
@@ -48,13 +99,13 @@ def getToken():
         return None
 
 # Function to search for a track
-async def search_track(token, track_name, artist_name):
+def search_track(session, token, track_name, artist_name):
     try:
         query = f"track:{track_name} artist:{artist_name}"
         headers = {
             'Authorization': f'Bearer {token}'
         }
-        response = requests.get(
+        response = session.get(
             f'https://api.spotify.com/v1/search?q={requests.utils.quote(query)}&type=track&limit=1',
             headers=headers
         )
@@ -69,6 +120,3 @@ async def search_track(token, track_name, artist_name):
     except Exception as error:
         print(f'Error searching for track "{track_name}": {str(error)}')
         return None
-    
-token =  getToken()
-print(token)
\ No newline at end of file
@@ -0,0 +1,60 @@
+# test_script.py
+import json
+import os
+import tempfile
+import unittest
+
+from script import iter_json_array
+
+
+class TestIterJsonArray(unittest.TestCase):
+    """Test cases for streaming a JSON array in chunks"""
+
+    def setUp(self):
+        """Create a scratch directory for the test files"""
+        self.temp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, text):
+        """Write text to a scratch JSON file and return its path"""
+        path = os.path.join(self.temp_dir.name, "data.json")
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+    def read(self, text, chunk_size):
+        return list(iter_json_array(self.write(text), chunk_size=chunk_size))
+
+    def test_matches_json_load(self):
+        """Test that every chunk size yields the same items as json.load"""
+        items = [
+            {"endTime": "2024-01-01 10:00", "artistName": "Artist, A", "trackName": "Track [1]", "msPlayed": 240000},
+            {"endTime": "2024-01-02 11:30", "artistName": "Artist B", "trackName": "Track 2", "msPlayed": 0}
+        ]
+        text = json.dumps(items, indent=2)
+
+        for chunk_size in (1, 2, 7, 64, 1 << 20):
+            self.assertEqual(self.read(text, chunk_size), items)
+
+    def test_scalars_split_across_chunks(self):
+        """Test that numbers cut by a chunk boundary are not split into two items"""
+        self.assertEqual(self.read('[12345, 678]', 3), [12345, 678])
+        self.assertEqual(self.read('[-1.5e3,true,null,"a,b]"]', 2), [-1500.0, True, None, "a,b]"])
+
+    def test_leading_whitespace(self):
+        """Test that whitespace before the array may span several chunks"""
+        self.assertEqual(self.read('  [ ]', 1), [])
+        self.assertEqual(self.read('\n\n  [1]', 1), [1])
+
+    def test_invalid_input(self):
+        """Test that non-arrays and truncated arrays raise"""
+        with self.assertRaises(ValueError):
+            self.read('{"a": 1}', 2)
+        with self.assertRaises(ValueError):
+            self.read('[1, 2', 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,56 @@
+# test_spotify_analyzer.py
+import unittest
+import pandas as pd
+from spotify_analyzer import SpotifyAnalyzer
+
+
+class TestTopRankings(unittest.TestCase):
+    """Test cases for the top artist and track rankings"""
+
+    def setUp(self):
+        """Set up plays where several tracks and artists tie"""
+        plays = [
+            ("Zebra", "Artist B", 60000),
+            ("Apple", "Artist C", 60000),
+            ("Mango", "Artist A", 60000),
+            ("Zebra", "Artist B", 60000),
+            ("Apple", "Artist C", 60000),
+            ("Mango", "Artist A", 60000),
+            ("Apple", "Artist A", 120000),
+            ("Kiwi", "Artist C", 45000),
+        ]
+        records = [
+            {"endTime": f"2024-01-0{day + 1} 12:00", "trackName": track, "artistName": artist, "msPlayed": ms}
+            for day, (track, artist, ms) in enumerate(plays)
+        ]
+        self.analyzer = SpotifyAnalyzer.from_records(records)
+
+        # Reference rankings: groupby totals with a stable sort, so ties stay in key order
+        self.df = self.analyzer.df[["trackName", "artistName", "msPlayed"]].astype({"trackName": object, "artistName": object})
+        self.df["hours_played"] = self.df["msPlayed"] / 3600000
+
+    def test_top_tracks_ties(self):
+        """Test that tied tracks keep the (track, artist) order of the groupby keys"""
+        keys = ["trackName", "artistName"]
+        for limit in (1, 2, 3, 10):
+            top_tracks = self.analyzer.top_tracks(limit)
+
+            expected_count = self.df.groupby(keys).size().sort_values(ascending=False, kind='stable').head(limit)
+            expected_time = self.df.groupby(keys)["hours_played"].sum().sort_values(ascending=False, kind='stable').head(limit)
+            self.assertEqual(list(top_tracks["by_count"].index), list(expected_count.index))
+            self.assertEqual(list(top_tracks["by_count"]), list(expected_count))
+            self.assertEqual(list(top_tracks["by_time"].index), list(expected_time.index))
+
+    def test_top_artists_ties(self):
+        """Test that tied artists are ranked by name"""
+        top_artists = self.analyzer.top_artists(3)
+
+        self.assertEqual(list(top_artists["by_count"].index), ["Artist A", "Artist C", "Artist B"])
+        self.assertEqual(list(top_artists["by_count"]), [3, 3, 2])
+
+        expected_time = self.df.groupby("artistName")["hours_played"].sum().sort_values(ascending=False, kind='stable').head(3)
+        self.assertEqual(list(top_artists["by_time"].index), list(expected_time.index))
+
+
+if __name__ == '__main__':
+    unittest.main()
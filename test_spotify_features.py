@@ -37,6 +37,15 @@ class MockSpotifyAPI:
     def artist(self, artist_id):
         """Mock artist method"""
         return self.artist_response
+    
+    def artists(self, artist_ids):
+        """Mock artists method"""
+        return {"artists": [self.artist_response for _ in artist_ids]}
+    
+    def tracks(self, track_ids):
+        """Mock tracks method"""
+        return {"tracks": [{"id": track_id, "artists": [{"id": self.artist_response["id"]}]}
+                           for track_id in track_ids]}
 
 
 class TestGenreAnalysis(unittest.TestCase):
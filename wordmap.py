@@ -1,23 +1,64 @@
 from wordcloud import WordCloud
 import matplotlib.pyplot as plt
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import io
+import os
 import re
 import json
 
-def create_word_map(text, max_words=100, background_color='white'):
-    # Clean the text (remove punctuation and convert to lowercase)
-    cleaned_text = re.sub(r'[^\w\s]', '', text.lower())
+try:
+    from orjson import loads as _json_loads
+except ImportError:  # orjson is optional, fall back to the stdlib parser
+    _json_loads = json.loads
+
+# Anything that is neither a word character nor whitespace
+_PUNCTUATION = re.compile(r'[^\w\s]')
+
+def _count_tokens(texts):
+    # Count the raw tokens a line at a time, so no cleaned copy or word list of
+    # the whole corpus is built
+    token_counts = Counter()
+    for text in texts:
+        for line in io.StringIO(text):
+            token_counts.update(line.split())
+    return token_counts
+
+def count_words(texts, workers=None):
+    # Counting is independent per text, so spread the texts over worker processes
+    # and merge their counts
+    workers = min(workers or os.cpu_count() or 1, len(texts))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            partials = pool.map(_count_tokens, [texts[i::workers] for i in range(workers)])
+            token_counts = Counter()
+            for partial in partials:
+                token_counts.update(partial)
+    else:
+        token_counts = _count_tokens(texts)
     
-    # Count word frequencies
-    word_counts = Counter(cleaned_text.split())
+    # Clean each distinct token once (remove punctuation and convert to lowercase)
+    # and merge the counts of tokens that clean to the same word
+    word_counts = Counter()
+    for token, count in token_counts.items():
+        word = _PUNCTUATION.sub('', token.lower())
+        if word:
+            word_counts[word] += count
+    return word_counts
+
+def create_word_map(text, max_words=100, background_color='white'):
+    # Accept either one text or a list of texts (e.g. one per song)
+    texts = [text] if isinstance(text, str) else list(text)
+    word_counts = count_words(texts)
     
-    # Create the word cloud
+    # Create the word cloud from only the words it can show; picking them with
+    # most_common saves WordCloud from sorting the whole vocabulary
     wordcloud = WordCloud(
         max_words=max_words,
         background_color=background_color,
         width=800,
         height=400
-    ).generate_from_frequencies(word_counts)
+    ).generate_from_frequencies(dict(word_counts.most_common(max_words)))
     
     # Display the word cloud
     plt.figure(figsize=(10, 5))
@@ -31,15 +72,13 @@ def create_word_map(text, max_words=100, background_color='white'):
     
     return wordcloud
 
+if __name__ == "__main__":
     # Write play statistics to output file
-lyrics_file = 'lyrics_info.json'
-with open(lyrics_file, 'r', encoding='utf-8') as file:
-          data = json.load(file)
-full_text=""
-
-for entry in data:
-    full_text=full_text + (entry['lyricsInfo']['lyrics'])
-
+    lyrics_file = 'lyrics_info.json'
+    with open(lyrics_file, 'rb') as file:
+        data = _json_loads(file.read())
+    # Keep the songs separate so they can be counted in parallel
+    lyrics = [entry['lyricsInfo']['lyrics'] for entry in data]
     
-# Example usage
-create_word_map(full_text, max_words=100, background_color='white')
\ No newline at end of file
+    # Example usage
+    create_word_map(lyrics, max_words=100, background_color='white')